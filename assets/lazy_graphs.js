@@ -0,0 +1,47 @@
+// Requests each chart once its slot scrolls into view. Every .chart-slot
+// holds a hidden .chart-load button; clicking it fires the slot's callback
+// in dashboard.py, so charts below the fold are not built on page load.
+(function () {
+  function load(slot) {
+    var button = slot.querySelector(".chart-load");
+    if (button) {
+      button.click();
+    }
+  }
+
+  var observer = null;
+  if ("IntersectionObserver" in window) {
+    observer = new IntersectionObserver(
+      function (entries) {
+        entries.forEach(function (entry) {
+          if (entry.isIntersecting) {
+            observer.unobserve(entry.target);
+            load(entry.target);
+          }
+        });
+      },
+      // Start a little before the slot is on screen
+      { rootMargin: "200px 0px" }
+    );
+  }
+
+  function watchSlots() {
+    document
+      .querySelectorAll(".chart-slot:not([data-lazy])")
+      .forEach(function (slot) {
+        slot.setAttribute("data-lazy", "");
+        if (observer) {
+          observer.observe(slot);
+        } else {
+          load(slot);
+        }
+      });
+  }
+
+  // Dash renders the layout after assets load, so look for new slots as
+  // they are added
+  new MutationObserver(watchSlots).observe(document.documentElement, {
+    childList: true,
+    subtree: true,
+  });
+})();
@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import zlib
+
+import psutil
+from dash import DiskcacheManager
+
+# Background callbacks run in long-lived build processes instead of a
+# process forked per job. A build process keeps its frame store, feature
+# sets and incremental indicator state between jobs, so the charts of one
+# symbol share one load of its data and each new bar only updates the
+# indicators.
+#
+# Every gunicorn worker starts its own build processes on its first job
+# ("lanes"), and a job goes to the lane of the symbol it is for: all builds
+# and refreshes of a symbol sent by a worker run in the same process, one at
+# a time. Results, progress and which process runs a job are kept in the
+# shared diskcache, so any worker can answer the browser's polls.
+#
+# A job that has started cannot be stopped without losing its lane's state,
+# so cancelled jobs run to completion; their figures still land in the
+# figure cache. A lane that dies is started again on the next job, and the
+# jobs it held are reported as cancelled.
+RUNNING_TIMEOUT = 3600
+# How often an idle lane checks that the worker that started it is alive
+PARENT_CHECK_SECONDS = 5
+
+
+class PersistentDiskcacheManager(DiskcacheManager):
+    """DiskcacheManager running jobs in ``lanes`` long-lived processes.
+
+    ``route`` maps a job's callback arguments to the key its lane is chosen
+    by, e.g. the symbol; without it every job runs in the first lane.
+    """
+
+    def __init__(self, cache=None, cache_by=None, expire=None, lanes=2, route=None):
+        super().__init__(cache, cache_by, expire)
+        self.lanes = lanes
+        self.route = route
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def make_job_fn(self, fn, progress, key=None):
+        job_fn = super().make_job_fn(fn, progress, key)
+        # Lanes find the function in their copy of the registry, so only
+        # plain data is sent to them
+        job_fn.registry_key = key
+        return job_fn
+
+    def _running_key(self, key):
+        return f"{key}-running"
+
+    def _lane(self, args):
+        route = None if self.route is None else self.route(args)
+        return zlib.crc32(repr(route).encode()) % self.lanes
+
+    def _serve(self, jobs, parent):
+        # Loop of a lane process. It is forked from a gunicorn worker, whose
+        # signal handlers would keep it from stopping with the worker.
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGQUIT):
+            signal.signal(signum, signal.SIG_DFL)
+        while True:
+            try:
+                job = jobs.get(timeout=PARENT_CHECK_SECONDS)
+            except queue.Empty:
+                if os.getppid() != parent:
+                    # The worker was killed without stopping its lanes
+                    return
+                continue
+            registry_key, key, args, context = job
+            try:
+                self.func_registry[registry_key](
+                    key, self._make_progress_key(key), args, context
+                )
+            finally:
+                self.handle.delete(self._running_key(key))
+
+    def _lane_process(self, lane):
+        # The lane's process and queue, started if it is not running
+        with self._lock:
+            process, jobs = self._lanes.get(lane, (None, None))
+            if process is None or not process.is_alive():
+                context = multiprocessing.get_context("fork")
+                jobs = context.Queue()
+                process = context.Process(
+                    target=self._serve, args=(jobs, os.getpid()), daemon=True
+                )
+                process.start()
+                self._lanes[lane] = process, jobs
+            return process, jobs
+
+    def call_job_fn(self, key, job_fn, args, context):
+        process, jobs = self._lane_process(self._lane(args))
+        with self.handle.transact():
+            # An identical job already queued or running gives its result
+            if self.job_running(key):
+                return key
+            self.handle.set(self._running_key(key), process.pid, expire=RUNNING_TIMEOUT)
+        jobs.put((job_fn.registry_key, key, args, dict(context)))
+        return key
+
+    def job_running(self, job):
+        if job is None:
+            return False
+        pid = self.handle.get(self._running_key(job))
+        if pid is None:
+            return False
+        try:
+            return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            return False
+
+    def terminate_job(self, job):
+        # Jobs are never killed, see above
+        pass
+
+    def terminate_unhealthy_job(self, job):
+        return False
@@ -1,16 +1,58 @@
-from dash import Dash, dcc, html
-from dash.dependencies import Input, Output
-from flask_caching import Cache
+import os
 
+import diskcache
+from dash import Dash, dcc, html, no_update
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+
+from build_workers import PersistentDiskcacheManager
+from data.frame_store import fingerprint
+from data.providers import get_provider
+from figure_cache import (
+    figure_key,
+    figure_lock,
+    load_figure,
+    store_figure,
+    store_traces,
+)
 from mcpc import get_mcpc_plot
 from pi_top import get_pi_top_plot
+from resampling import load_resampler, resample
 from s2f import get_s2f_plot
 from seasonality_heatmap import get_seasonality_heatmap_plot
 from z_score import get_z_score_plot
 from nupl_score import get_nupl_score_plot
 from rainbow_chart import get_rainbow_plot
-from sharpe_ratio import get_sharpe_plot
-app = Dash(__name__)
+from sharpe_ratio import SHARPE_WINDOWS, get_sharpe_plot
+
+# Figures not in the cache yet are built by background jobs, so a cold
+# build never holds a gunicorn worker. The jobs run in long-lived build
+# processes that keep the data and indicator state of the symbols they built,
+# and every job for a symbol goes to the same one (see build_workers.py).
+# Job results are kept for a minute, which lets identical jobs share one
+# result; a job's arguments name its chart, as every chart's job function
+# has the same source, which is all Dash keys results on besides the
+# arguments.
+JOB_DIR = "jobs"
+JOB_LANES = 2
+
+
+def job_symbol(args):
+    # Chart builds are passed their job request, update_data the symbol
+    job = args[-1]
+    return job["symbol"] if isinstance(job, dict) else job
+
+
+background_callback_manager = PersistentDiskcacheManager(
+    # Absolute, as build processes open the cache again after forking
+    diskcache.Cache(os.path.abspath(JOB_DIR)),
+    cache_by=[],
+    expire=60,
+    lanes=JOB_LANES,
+    route=job_symbol,
+)
+
+app = Dash(__name__, background_callback_manager=background_callback_manager)
 server = app.server
 app.title = "Valatility Crypto Dashboard"
 
@@ -46,14 +88,79 @@ l.parentNode.insertBefore(s, l);
 </html>
 '''
 
-cache = Cache(
-    app.server,
-    config={
-        "CACHE_TYPE": "FileSystemCache",
-        "CACHE_DIR": "cache",
-        "CACHE_DEFAULT_TIMEOUT": 3600,
-    },
-)
+# Charts in page order. Each one has its own slot and callback, so a chart
+# paints as soon as it is built, and assets/lazy_graphs.js only asks for a
+# chart once its slot scrolls into view.
+CHARTS = {
+    "rainbow": get_rainbow_plot,
+    "pi-top": get_pi_top_plot,
+    "seasonality": get_seasonality_heatmap_plot,
+    "sharpe": get_sharpe_plot,
+    "s2f": get_s2f_plot,
+    "z-score": get_z_score_plot,
+    "mcpc": get_mcpc_plot,
+    "nupl": get_nupl_score_plot,
+}
+# Charts only shown for some symbols
+CHART_SYMBOLS = {"s2f": ("BTC",)}
+# Charts built from CoinMetrics data rather than the OHLCV history
+COINMETRICS_CHARTS = {"s2f"}
+# Line charts sent downsampled and re-aggregated on zoom, see resampling.py
+RESAMPLED_CHARTS = {"rainbow", "pi-top", "sharpe", "s2f", "z-score", "nupl"}
+# Components whose value is passed to a chart, by keyword argument
+CHART_CONTROLS = {"sharpe": {"window": "sharpe-window"}}
+
+GRAPH_CONFIG = {
+    "displaylogo": False,
+    "scrollZoom": True,
+    "modeBarButtonsToAdd": [
+        "drawline",
+        "drawopenpath",
+        "drawclosedpath",
+        "drawcircle",
+        "drawrect",
+        "eraseshape",
+    ],
+}
+# Shown in a slot until its chart arrives
+EMPTY_FIGURE = {
+    "layout": {
+        "xaxis": {"visible": False},
+        "yaxis": {"visible": False},
+        "plot_bgcolor": "rgba(17, 17, 17, 1)",
+        "paper_bgcolor": "rgba(0, 0, 0, 0)",
+    }
+}
+
+
+def chart_slot(name):
+    # The hidden button is what the lazy loader clicks to request the chart
+    children = [
+        html.Button(
+            id=f"{name}-load",
+            className="chart-load",
+            n_clicks=0,
+            style={"display": "none"},
+        ),
+        dcc.Graph(id=f"{name}-graph", config=GRAPH_CONFIG, figure=EMPTY_FIGURE),
+        html.Div(id=f"{name}-progress", className="chart-progress"),
+        # Request for a background build, set when the figure is not cached
+        dcc.Store(id=f"{name}-job"),
+    ]
+    if name == "sharpe":
+        children.insert(
+            1,
+            dcc.Dropdown(
+                id="sharpe-window",
+                options=[
+                    {"label": label, "value": window}
+                    for window, label in SHARPE_WINDOWS.items()
+                ],
+                value=180,
+                clearable=False,
+            ),
+        )
+    return html.Div(children, id=f"{name}-slot", className="chart-slot")
 
 
 def send_layout():
@@ -148,7 +255,11 @@ def send_layout():
                 value="BTC",  # Default value
                 clearable=False,
             ),
-            html.Div(id="graphs-container"),
+            html.Div(
+                id="graphs-container", children=[chart_slot(name) for name in CHARTS]
+            ),
+            # Set once the selected symbol's data has been refreshed
+            dcc.Store(id="data-refresh"),
             html.Button("Update Data", id="update-data", n_clicks=0),
         ],
     )
@@ -157,257 +268,182 @@ def send_layout():
 app.layout = send_layout
 
 
-@cache.memoize()
-def get_cached_data(func, symbol="BTC", currency="USD"):
-    return func(symbol=symbol, currency=currency)
+def get_cached_data(
+    func,
+    symbol="BTC",
+    currency="USD",
+    provider=None,
+    version=None,
+    resampled=False,
+    **kwargs,
+):
+    # Stored as compressed JSON, so a hit comes back as a plain dict. A
+    # resampled figure stores its downsampled traces, and its full
+    # resolution traces are stored beside it for zooming.
+    key = figure_key(func, symbol, currency, provider, version, **kwargs)
+    figure = load_figure(key)
+    if figure is None:
+        figure = func(symbol=symbol, currency=currency, provider=provider, **kwargs)
+        if resampled:
+            store_traces(key, figure)
+            figure = resample(figure)
+        figure = store_figure(key, figure)
+    return figure
+
+
+def data_version(name, symbol, provider=None):
+    # Fingerprint of the data a chart is built from. New data gives the
+    # chart's figures new cache keys; other symbols' figures stay cached.
+    currency = None if name in COINMETRICS_CHARTS else "USD"
+    return get_provider(provider).data_fingerprint(symbol, currency)
+
+
+def loaded_data_version(name, symbol, provider=None):
+    # Fingerprint of the frame a build of the chart reads. Loading it first
+    # refreshes stale history, so the figure is stored under the version of
+    # the data it is built from, which is the version later requests and
+    # zooms ask for. The chart then gets the same frame from the frame store.
+    provider = get_provider(provider)
+    if name in COINMETRICS_CHARTS:
+        return fingerprint(provider.get_coinmetrics_data(symbol))
+    return fingerprint(provider.get_historical_data(symbol, "USD"))
 
 
 @app.callback(
-    Output("graphs-container", "children"),
-    [Input("update-data", "n_clicks"), Input("crypto-selector", "value")],
+    Output("data-refresh", "data"),
+    Input("update-data", "n_clicks"),
+    State("crypto-selector", "value"),
+    background=True,
+    running=[(Output("update-data", "disabled"), True, False)],
+    prevent_initial_call=True,
 )
-def update_graphs(n_clicks, selected_crypto):
-    # Assuming the necessity to fetch fresh data when "Update Data" is clicked
-    if n_clicks > 0:
-        cache.clear()  # Clearing the whole cache. Use delete_memoized for specific func if needed.
-
-    if selected_crypto == "BTC":
-        graphs = [
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_rainbow_plot, symbol=selected_crypto),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_pi_top_plot, symbol=selected_crypto),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(
-                    get_seasonality_heatmap_plot, symbol=selected_crypto
-                ),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_sharpe_plot, symbol=selected_crypto),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_s2f_plot, symbol=selected_crypto),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_z_score_plot, symbol=selected_crypto),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_mcpc_plot, symbol=selected_crypto),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_nupl_score_plot, symbol=selected_crypto),
-            ),
-        ]
-        return graphs
-    else:
-        graphs = [
-             dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_rainbow_plot, symbol=selected_crypto),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_pi_top_plot, symbol=selected_crypto),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(
-                    get_seasonality_heatmap_plot, symbol=selected_crypto
-                ),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_sharpe_plot, symbol=selected_crypto),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_z_score_plot, symbol=selected_crypto),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_mcpc_plot, symbol=selected_crypto),
-            ),
-            dcc.Graph(
-                config={
-                    "displaylogo": False,
-                    "scrollZoom": True,
-                    "modeBarButtonsToAdd": [
-                        "drawline",
-                        "drawopenpath",
-                        "drawclosedpath",
-                        "drawcircle",
-                        "drawrect",
-                        "eraseshape",
-                    ],
-                },
-                figure=get_cached_data(get_nupl_score_plot, symbol=selected_crypto),
-            ),
-        ]
-        return graphs
+def update_data(n_clicks, selected_crypto, provider=None):
+    # Fetch fresh data for the selected symbol only when "Update Data" is
+    # clicked; its charts pick the new data up through their data version
+    get_provider(provider).refresh(selected_crypto)
+    return {"symbol": selected_crypto, "clicks": n_clicks}
+
+
+@app.callback(
+    [Output(f"{name}-slot", "style") for name in CHART_SYMBOLS],
+    Input("crypto-selector", "value"),
+)
+def show_chart_slots(selected_crypto):
+    return [
+        {} if selected_crypto in symbols else {"display": "none"}
+        for symbols in CHART_SYMBOLS.values()
+    ]
+
+
+def cached_figure(func, symbol, provider=None, version=None, **kwargs):
+    """The figure get_cached_data would return, or None if it is not cached."""
+    return load_figure(figure_key(func, symbol, "USD", provider, version, **kwargs))
+
+
+def build_figure(set_progress, name, symbol, kwargs, provider=None):
+    # Runs in a background job. Identical jobs started by other visitors
+    # wait for the first one and then read its figure from the cache.
+    func = CHARTS[name]
+    version = loaded_data_version(name, symbol, provider)
+    key = figure_key(func, symbol, "USD", provider, version, **kwargs)
+    build = dict(
+        symbol=symbol,
+        provider=provider,
+        version=version,
+        resampled=name in RESAMPLED_CHARTS,
+        **kwargs,
+    )
+    with figure_lock(key, blocking=False) as acquired:
+        if acquired:
+            set_progress(f"Building the {symbol} chart...")
+            return get_cached_data(func, **build)
+    set_progress(f"Waiting for the {symbol} chart another visitor asked for...")
+    with figure_lock(key):
+        return get_cached_data(func, **build)
+
+
+def register_chart(name, func):
+    controls = CHART_CONTROLS.get(name, {})
+    resampled = name in RESAMPLED_CHARTS
+
+    @app.callback(
+        Output(f"{name}-graph", "figure"),
+        Output(f"{name}-job", "data"),
+        Input(f"{name}-load", "n_clicks"),
+        Input("crypto-selector", "value"),
+        Input("data-refresh", "data"),
+        *[Input(component, "value") for component in controls.values()],
+        prevent_initial_call=True,
+    )
+    def update_chart(n_clicks, selected_crypto, refreshed, *values, provider=None):
+        # Nothing is built until the slot has scrolled into view, or for a
+        # symbol the chart is not shown for
+        if not n_clicks or selected_crypto not in CHART_SYMBOLS.get(
+            name, (selected_crypto,)
+        ):
+            raise PreventUpdate
+        kwargs = dict(zip(controls, values))
+        version = data_version(name, selected_crypto, provider)
+        figure = cached_figure(func, selected_crypto, provider, version, **kwargs)
+        if figure is not None:
+            return figure, no_update
+        # Not cached: hand the build to a background job. The version only
+        # tells jobs for different data apart; the build keys its figure on
+        # the data it loads.
+        job = {
+            "chart": name,
+            "symbol": selected_crypto,
+            "kwargs": kwargs,
+            "version": version,
+        }
+        return no_update, job
+
+    @app.callback(
+        Output(f"{name}-graph", "figure", allow_duplicate=True),
+        Input(f"{name}-job", "data"),
+        background=True,
+        progress=Output(f"{name}-progress", "children"),
+        running=[
+            (
+                Output(f"{name}-progress", "style"),
+                {"display": "block"},
+                {"display": "none"},
+            )
+        ],
+        prevent_initial_call=True,
+    )
+    def build_chart(set_progress, job):
+        return build_figure(set_progress, name, job["symbol"], job["kwargs"])
+
+    if not resampled:
+        return update_chart, build_chart
+
+    @app.callback(
+        Output(f"{name}-graph", "figure", allow_duplicate=True),
+        Input(f"{name}-graph", "relayoutData"),
+        State("crypto-selector", "value"),
+        *[State(component, "value") for component in controls.values()],
+        prevent_initial_call=True,
+    )
+    def resample_chart(relayout_data, selected_crypto, *values, provider=None):
+        # Re-aggregate the traces for the range zoomed to. Sends only the
+        # changed trace data, as a patch of the figure in the browser.
+        if not relayout_data:
+            raise PreventUpdate
+        kwargs = dict(zip(controls, values))
+        version = data_version(name, selected_crypto, provider)
+        key = figure_key(func, selected_crypto, "USD", provider, version, **kwargs)
+        resampler = load_resampler(key)
+        if resampler is None:
+            # Expired, or the data changed since the figure was shown
+            raise PreventUpdate
+        return resampler.construct_update_data_patch(relayout_data)
+
+    return update_chart, build_chart, resample_chart
+
+
+for name, func in CHARTS.items():
+    register_chart(name, func)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+import os
+import tempfile
+
+import pyarrow as pa
+
+from data.history_store import history_path, history_version, read_history
+from data.locking import file_lock
+
+# The parquet partitions stay the durable format. Next to each dataset
+# directory sits an uncompressed Arrow IPC file derived from them,
+#
+#   history/BTC_USD_data.arrow
+#
+# which every gunicorn worker memory-maps. Workers then share one copy of
+# each history through the page cache, and pandas gets views over the mapped
+# buffers instead of decoding parquet into private memory.
+_VERSION_KEY = b"history_version"
+
+
+def arrow_path(dataset):
+    return f"{history_path(dataset)}.arrow"
+
+
+def _encode_version(version):
+    return repr(version).encode()
+
+
+def write_arrow_cache(dataset, df, version):
+    """Write ``df`` as a single-chunk Arrow IPC file tagged with ``version``."""
+    table = pa.Table.from_pandas(df).combine_chunks()
+    metadata = dict(table.schema.metadata or {})
+    metadata[_VERSION_KEY] = _encode_version(version)
+    table = table.replace_schema_metadata(metadata)
+
+    path = arrow_path(dataset)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)),
+        prefix=f".{os.path.basename(path)}.",
+        suffix=".tmp",
+    )
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_arrow_cache(dataset, version):
+    """Map the Arrow file if it was derived from ``version``, else None."""
+    try:
+        source = pa.memory_map(arrow_path(dataset), "r")
+        table = pa.ipc.open_file(source).read_all()
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    if (table.schema.metadata or {}).get(_VERSION_KEY) != _encode_version(version):
+        return None
+    # split_blocks keeps one block per column so numeric columns without
+    # nulls come back as zero-copy views over the mapping
+    return table.to_pandas(split_blocks=True)
+
+
+def read_history_mapped(dataset):
+    """read_history(dataset), served from the shared Arrow mapping when current."""
+    version = history_version(dataset)
+    df = read_arrow_cache(dataset, version)
+    if df is not None:
+        return df
+
+    df = read_history(dataset)
+    if df is None:
+        return None
+    # One worker rebuilds the mapping, the others keep their parquet read
+    with file_lock(arrow_path(dataset), blocking=False) as acquired:
+        if acquired and history_version(dataset) == version:
+            write_arrow_cache(dataset, df, version)
+    return df
@@ -0,0 +1,43 @@
+import pandas as pd
+
+# CryptoCompare's histo* endpoints return at most limit + 1 bars per request
+CRYPTOCOMPARE_PAGE_LIMIT = 2000
+
+
+def _step(freq):
+    return pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+
+
+def missing_ranges(index, end, freq="D"):
+    """Work out which bars are missing from ``index`` up to ``end``.
+
+    Returns a list of inclusive (start, end) timestamp ranges. The last stored
+    bar is always included, because it may have been saved while still open.
+    """
+    end = pd.Timestamp(end).floor(freq)
+    if len(index) == 0:
+        return []
+    expected = pd.date_range(index[0], end, freq=freq)
+    missing = expected.difference(index[:-1])
+    if len(missing) == 0:
+        return []
+
+    # Split the missing bars into runs of consecutive timestamps
+    step = _step(freq)
+    breaks = (missing[1:] - missing[:-1]) != step
+    starts = [missing[0], *missing[1:][breaks]]
+    ends = [*missing[:-1][breaks], missing[-1]]
+    return list(zip(starts, ends))
+
+
+def cryptocompare_pages(start, end, freq="D", page_limit=CRYPTOCOMPARE_PAGE_LIMIT):
+    """Split an inclusive range into (toTs, limit) requests, newest page first."""
+    step = _step(freq)
+    pages = []
+    to_ts = pd.Timestamp(end)
+    while to_ts >= start:
+        # limit + 1 bars come back, ending at toTs
+        bars = min(int((to_ts - start) / step) + 1, page_limit + 1)
+        pages.append((int(to_ts.timestamp()), max(bars - 1, 1)))
+        to_ts -= step * bars
+    return pages
@@ -0,0 +1,181 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from data.arrow_cache import read_history_mapped
+from data.get_historical_data import (
+    get_coinmetrics_data,
+    get_historical_data,
+    get_timeframe_data,
+)
+from data.history_store import history_exists, history_version
+from data.resample import STORED_TIMEFRAMES, source_timeframe, timeframe_delta
+
+# In-process store of loaded frames, keyed by (symbol, currency) for OHLCV data
+# and by (symbol, "S2F") for CoinMetrics data. Every plot on a render shares one
+# decoded frame instead of re-reading and re-checking the history store itself.
+#
+# A frame whose last bar is the current one is kept until the next bar is
+# due. One that is behind, because the upstream failed or another worker was
+# refreshing, is only kept for STALE_RETRY_SECONDS, and the load is then
+# tried again. Either way it is dropped as soon as the stored history changes.
+#
+# _lock only guards the dicts. Loading a frame can mean a network refresh, so
+# it runs under a lock of its own key: threads asking for the same frame wait
+# for one load, and other symbols load in parallel.
+STALE_RETRY_SECONDS = 60
+
+_frames = {}
+_key_locks = {}
+_lock = threading.Lock()
+
+
+def _today():
+    return pd.Timestamp.now(tz="UTC").floor("D")
+
+
+def _current_bar(source):
+    # Start of the newest bar of the ``source`` history, e.g. this hour for
+    # 1h, so intraday frames are reloaded as each source bar comes due
+    return pd.Timestamp.now(tz="UTC").floor(STORED_TIMEFRAMES[source])
+
+
+def _coinmetrics_day():
+    # CoinMetrics publishes a day once it is over, on the local calendar as
+    # get_coinmetrics_data counts it
+    return pd.Timestamp(datetime.now().date() - timedelta(days=1))
+
+
+def freeze_frame(df):
+    """Mark the backing arrays read-only so no caller can edit shared data."""
+    for block in df._mgr.blocks:
+        if hasattr(block.values, "flags"):
+            block.values.flags.writeable = False
+    return df
+
+
+def frame_view(df):
+    """Shallow copy over the frozen arrays.
+
+    Columns a caller adds stay on its own copy and never leak into the
+    stored frame.
+    """
+    return df.copy(deep=False)
+
+
+def _valid_frame(key, dataset, period):
+    # The stored frame for ``key`` while it can still be served, otherwise None
+    with _lock:
+        entry = _frames.get(key)
+    if entry is None or entry["stamp"] != history_version(dataset):
+        return None
+    if entry["expires"] is None:
+        valid = entry["period"] == period
+    else:
+        valid = time.monotonic() < entry["expires"]
+    return entry["frame"] if valid else None
+
+
+def _get_frame(key, dataset, loader, period, bar=pd.Timedelta(days=1)):
+    # ``period`` is the start of the newest bar a current frame ends in, and
+    # ``bar`` the length of the frame's bars
+    df = _valid_frame(key, dataset, period)
+    if df is not None:
+        return frame_view(df)
+
+    with _lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        # Another thread may have loaded it while we waited
+        df = _valid_frame(key, dataset, period)
+        if df is None:
+            # Read before loading: a refresh during the load changes the
+            # version, so the frame is not kept against the new history
+            stamp = history_version(dataset)
+            # Stale or missing: the loader refreshes the stored history if needed
+            df = freeze_frame(loader())
+            current = len(df) > 0 and df.index[-1] + bar > period
+            entry = {
+                "frame": df,
+                "stamp": stamp,
+                "period": period,
+                "expires": None if current else time.monotonic() + STALE_RETRY_SECONDS,
+            }
+            with _lock:
+                _frames[key] = entry
+    return frame_view(df)
+
+
+def get_historical_frame(symbol, currency, timeframe="1d"):
+    """Shared read-only view of get_historical_data(symbol, currency).
+
+    Other timeframes come from get_timeframe_data and are stored until the
+    history they were resampled from changes.
+    """
+    if timeframe == "1d":
+        return _get_frame(
+            (symbol, currency),
+            f"{symbol}_{currency}_data",
+            lambda: get_historical_data(symbol, currency),
+            _today(),
+        )
+    source = source_timeframe(timeframe)
+    dataset = f"{symbol}_{currency}_data"
+    if source != "1d":
+        dataset = f"{symbol}_{currency}_{source}_data"
+    return _get_frame(
+        (symbol, currency, timeframe),
+        dataset,
+        lambda: get_timeframe_data(symbol, currency, timeframe),
+        _current_bar(source),
+        timeframe_delta(timeframe),
+    )
+
+
+def get_coinmetrics_frame(symbol):
+    """Shared read-only view of get_coinmetrics_data(symbol)."""
+    return _get_frame(
+        (symbol, "S2F"),
+        f"{symbol}_S2F_data",
+        lambda: get_coinmetrics_data(symbol),
+        _coinmetrics_day(),
+    )
+
+
+def fingerprint(df):
+    """Row count and last date of ``df``, e.g. "5000:2024-03-05T00:00:00+00:00"."""
+    if df is None or not len(df):
+        return None
+    return f"{len(df)}:{df.index[-1].isoformat()}"
+
+
+def stored_fingerprint(symbol, currency=None):
+    """Fingerprint of the stored history, without refreshing it.
+
+    The OHLCV history of ``currency``, or the CoinMetrics history when it is
+    None. None when nothing is stored yet.
+    """
+    if currency is None:
+        key, dataset = (symbol, "S2F"), f"{symbol}_S2F_data"
+    else:
+        key, dataset = (symbol, currency), f"{symbol}_{currency}_data"
+    with _lock:
+        entry = _frames.get(key)
+    if entry is not None and entry["stamp"] == history_version(dataset):
+        return fingerprint(entry["frame"])
+    if not history_exists(dataset):
+        return None
+    return fingerprint(read_history_mapped(dataset))
+
+
+def invalidate(symbol=None, currency=None):
+    """Drop stored frames, optionally only those for one symbol/currency."""
+    with _lock:
+        for key in list(_frames):
+            if symbol is not None and key[0] != symbol:
+                continue
+            if currency is not None and key[1] not in (currency, "S2F"):
+                continue
+            del _frames[key]
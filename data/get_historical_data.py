@@ -1,185 +1,323 @@
-import os
 from datetime import datetime, timedelta, timezone
 
 import pandas as pd
-import requests
-from pandas import json_normalize
 
+from data.arrow_cache import read_history_mapped
+from data.fetch_planner import (
+    CRYPTOCOMPARE_PAGE_LIMIT,
+    cryptocompare_pages,
+    missing_ranges,
+)
+from data.history_store import (
+    append_history,
+    combine_history,
+    history_exists,
+    history_path,
+    iter_history,
+    last_period,
+    migrate_legacy_file,
+    read_history,
+    write_history,
+)
+from data.http_client import (
+    UpstreamError,
+    UpstreamPayloadError,
+    fetch_deadline,
+    get_json,
+)
+from data.ingest import coinmetrics_frame, cryptocompare_frame
+from data.locking import single_flight
+from data.resample import (
+    STORED_TIMEFRAMES,
+    resample_ohlcv,
+    source_timeframe,
+    timeframe_rule,
+)
+
+# Upstream endpoints, module-level so a local stand-in server can replace them
+CRYPTOCOMPARE_URL = "https://min-api.cryptocompare.com/data/v2/{endpoint}"
+CRYPTOCOMPARE_ENDPOINTS = {"1d": "histoday", "1h": "histohour", "1m": "histominute"}
+COINMETRICS_URL = "https://community-api.coinmetrics.io/v4/timeseries/asset-metrics"
+COINMETRICS_PAGE_SIZE = 10000
+
+
+@fetch_deadline()
+def fetch_cryptocompare_bars(symbol, currency, ranges=None, timeframe="1d"):
+    """Fetch raw CryptoCompare bars, all history or only ``ranges``.
+
+    ``timeframe`` is one of the stored bar sizes: "1d", "1h" or "1m". All of
+    the pages share one fetch deadline.
+    """
+    url = CRYPTOCOMPARE_URL.format(endpoint=CRYPTOCOMPARE_ENDPOINTS[timeframe])
+    freq = STORED_TIMEFRAMES[timeframe]
+
+    def get_page(to_ts, limit):
+        parameters = {
+            "fsym": symbol,
+            "tsym": currency,
+            "toTs": to_ts,
+            "limit": limit,
+        }
+        payload = get_json("cryptocompare", url, parameters)
+        if payload.get("Response") == "Error":
+            raise UpstreamPayloadError(url, payload.get("Message"))
+        return payload["Data"]["Data"]
+
+    if ranges is None:
+        # Cold start: page back from now until the pages run past the first
+        # traded bar, where CryptoCompare pads with zero rows, or past the
+        # oldest bar it serves for this bar size
+        to_ts = int(datetime.utcnow().timestamp())
+        entries = []
+        while True:
+            try:
+                page = get_page(to_ts, CRYPTOCOMPARE_PAGE_LIMIT)
+            except UpstreamPayloadError:
+                if not entries:
+                    raise
+                break
+            entries = page + entries
+            if len(page) <= CRYPTOCOMPARE_PAGE_LIMIT or page[0]["close"] == 0:
+                break
+            to_ts = page[0]["time"] - 1
+    else:
+        # Request exactly the missing ranges, one page per 2000 bars
+        entries = []
+        for start, end in ranges:
+            for to_ts, limit in cryptocompare_pages(start, end, freq):
+                page = get_page(to_ts, limit)
+                entries.extend(
+                    entry
+                    for entry in page
+                    if start.timestamp() <= entry["time"] <= end.timestamp()
+                )
 
-def get_historical_data(symbol, currency):
-
-    def get_data(symbol, currency, last_date=None):
-
-        all_time_data = []
-        url = "https://min-api.cryptocompare.com/data/v2/histoday"
-
-        end_date = datetime.utcnow()
-
-        if last_date is None:
-            parameters = {"fsym": symbol, "tsym": currency, "allData": "true"}
-        else:
-            parameters = {
-                "fsym": symbol,
-                "tsym": currency,
-                "toTs": int(end_date.timestamp()),
-                "limit": "2000",
-            }
-
-        response = requests.get(url, params=parameters)
-        data = response.json()
-
-        for entry in data["Data"]["Data"]:
-            date = datetime.utcfromtimestamp(entry["time"]).strftime("%Y-%m-%d")
-            open_price, high_price, low_price, close_price, volume = (
-                entry["open"],
-                entry["high"],
-                entry["low"],
-                entry["close"],
-                entry["volumefrom"],
-            )
-            all_time_data.append(
-                [date, open_price, high_price, low_price, close_price, volume]
-            )
-        return all_time_data
-
-    filename = f"{symbol}_{currency}_data.parquet"
+    return entries
 
-    if os.path.exists(filename):
-        df = pd.read_parquet(filename)
 
-        # Ensure the df's index is correctly set to UTC
-        if (
-            df.index.tzinfo is not None
-            and df.index.tzinfo.utcoffset(df.index[0]) is not None
-        ):
-            df.index = df.index.tz_convert("UTC")
-        else:
-            df.index = df.index.tz_localize("UTC")
+def get_historical_data(symbol, currency):
 
+    def is_fresh(df):
         last_date = df.index[-1]
         time_now = pd.to_datetime(datetime.utcnow(), utc=True)
+        return last_date.strftime("%Y-%m-%d") == time_now.strftime("%Y-%m-%d")
 
-        if last_date.strftime("%Y-%m-%d") == time_now.strftime("%Y-%m-%d"):
-            return df
-        else:
-            # Get the new data
-            new_df = get_data(symbol, currency, last_date)
-            new_df = pd.DataFrame(
-                new_df, columns=["Date", "Open", "High", "Low", "Close", "Volume"]
-            )
-            new_df["Date"] = pd.to_datetime(new_df["Date"], utc=True)
-            new_df.set_index("Date", inplace=True)
-            # Append the new data to the existing data
-            df = pd.concat([df, new_df]).sort_index()
-            df = df[~df.index.duplicated(keep="last")]
-            # Save the updated data to the parquet file
-            df.to_parquet(filename)
+    dataset = f"{symbol}_{currency}_data"
+    # Histories saved before the partitioned store existed are imported once
+    migrate_legacy_file(dataset, f"{dataset}.parquet", read=read_historical_file)
 
+    df = read_history_mapped(dataset) if history_exists(dataset) else None
+    if df is not None and is_fresh(df):
+        return df
+
+    with single_flight(history_path(dataset), have_previous=df is not None) as refresh:
+        if not refresh:
+            # Another worker is refreshing the data, serve the previous version
             return df
-    else:
-        all_time_data = get_data(symbol, currency)
-        df = pd.DataFrame(
-            all_time_data, columns=["Date", "Open", "High", "Low", "Close", "Volume"]
-        )
-        df["Date"] = pd.to_datetime(df["Date"], utc=True)
-        df.set_index("Date", inplace=True)
 
-        # Drop rows where all values are 0.0
-        df = df.loc[~(df == 0.0).all(axis=1)]
+        # Another worker may have refreshed the data while we waited for the lock
+        if history_exists(dataset):
+            df = read_history_mapped(dataset)
+            if is_fresh(df):
+                return df
+
+        if df is not None:
+            # Get only the days missing from the stored history. The re-fetched
+            # last day replaces its stored version on read.
+            ranges = missing_ranges(df.index, datetime.now(timezone.utc))
+            try:
+                new_df = cryptocompare_frame(
+                    fetch_cryptocompare_bars(symbol, currency, ranges)
+                )
+            except UpstreamError as e:
+                # Serve yesterday's history rather than failing the render
+                print("A cryptocompare error occurred, serving stored data:", e)
+                return df
+            append_history(dataset, new_df)
+            df = combine_history([df, new_df])
+        else:
+            df = cryptocompare_frame(fetch_cryptocompare_bars(symbol, currency))
+
+            # Drop rows where all values are 0.0
+            df = df.loc[~(df == 0.0).all(axis=1)]
 
-        df.to_parquet(filename)
+            write_history(dataset, df)
     return df
 
 
-def get_coinmetrics_data(symbol):
+def update_intraday_data(symbol, currency, timeframe):
+    """Bring the stored "1h" or "1m" bars up to date and return the dataset.
+
+    Intraday histories are partitioned by month and never read whole here:
+    freshness and gaps are worked out from the newest partition only.
+    """
+    freq = STORED_TIMEFRAMES[timeframe]
+    dataset = f"{symbol}_{currency}_{timeframe}_data"
+
+    def latest_bars():
+        period = last_period(dataset)
+        return read_history(dataset, start=period) if period is not None else None
+
+    def is_fresh(df):
+        return df.index[-1] == pd.Timestamp.now(tz="UTC").floor(freq)
+
+    df = latest_bars()
+    if df is not None and is_fresh(df):
+        return dataset
+
+    with single_flight(history_path(dataset), have_previous=df is not None) as refresh:
+        if not refresh:
+            # Another worker is refreshing the data, serve the previous version
+            return dataset
+
+        # Another worker may have refreshed the data while we waited for the lock
+        df = latest_bars()
+        if df is not None and is_fresh(df):
+            return dataset
+
+        if df is not None:
+            ranges = missing_ranges(df.index, datetime.now(timezone.utc), freq)
+            try:
+                bars = fetch_cryptocompare_bars(symbol, currency, ranges, timeframe)
+            except UpstreamError as e:
+                print("A cryptocompare error occurred, serving stored data:", e)
+                return dataset
+            append_history(dataset, cryptocompare_frame(bars), freq="M")
+        else:
+            df = cryptocompare_frame(
+                fetch_cryptocompare_bars(symbol, currency, timeframe=timeframe)
+            )
 
-    def get_data(symbol, last_date=None):
-        try:
-            # Get today's date
-            today = datetime.now().date()
-            yesterday = today - timedelta(days=1)
+            # Drop rows where all values are 0.0
+            df = df.loc[~(df == 0.0).all(axis=1)]
 
-            # Save yesterday's date as end_date
-            end_date = yesterday.strftime("%Y-%m-%d")
+            write_history(dataset, df, freq="M")
+    return dataset
 
-            if last_date is not None:
-                start_date = (last_date + timedelta(days=1)).strftime("%Y-%m-%d")
-            else:
-                start_date = datetime(2010, 1, 1).strftime(
-                    "%Y-%m-%d"
-                )  # Start from the beginning if there's no last_date
 
-            metrics = "SplyCur,IssContNtv,CapMrktCurUSD,PriceUSD,DiffMean"
+def get_timeframe_data(symbol, currency, timeframe):
+    """OHLCV bars of any timeframe ("4h", "15m", "1w", ...), resampled on read.
 
-            # fetch the metrics
-            data = requests.get(
-                f"https://community-api.coinmetrics.io/v4/timeseries/asset-metrics?assets={symbol}&metrics={metrics}&start_time={start_date}&end_time={end_date}&frequency=1d&page_size=10000&pretty=true"
-            ).json()
+    The bars are built from the coarsest stored bar size that divides the
+    timeframe. The stored history is streamed through the aggregation one
+    partition at a time.
+    """
+    source = source_timeframe(timeframe)
+    if source == "1d":
+        df = get_historical_data(symbol, currency)
+        if timeframe_rule(timeframe) == "1D":
+            return df
+        return resample_ohlcv([df], timeframe)
+    dataset = update_intraday_data(symbol, currency, source)
+    return resample_ohlcv(iter_history(dataset), timeframe)
 
-            data = json_normalize(data["data"])
 
-            # Convert 'time' column to datetime type if it's not already
-            data["time"] = pd.to_datetime(data["time"], utc=True)
+def read_historical_file(filename):
+    df = pd.read_parquet(filename)
 
-            # Drop duplicate entries in 'time' column
-            data = data.drop_duplicates(subset=["time"])
+    # Ensure the df's index is correctly set to UTC
+    if (
+        df.index.tzinfo is not None
+        and df.index.tzinfo.utcoffset(df.index[0]) is not None
+    ):
+        df.index = df.index.tz_convert("UTC")
+    else:
+        df.index = df.index.tz_localize("UTC")
+    return df
 
-            # Set the 'time' column as the index
-            data = data.set_index("time")
 
-            # Format the index as strings with the desired format
-            data.index = data.index.strftime("%Y-%m-%d")
+@fetch_deadline()
+def fetch_coinmetrics_rows(symbol, ranges=None):
+    """Fetch raw CoinMetrics daily rows, all history or only ``ranges``.
+
+    All of the pages share one fetch deadline.
+    """
+    if ranges is None:
+        # Get today's date
+        today = datetime.now().date()
+        yesterday = today - timedelta(days=1)
+
+        # Start from the beginning if there's no stored history
+        ranges = [(datetime(2010, 1, 1), yesterday)]
+
+    metrics = "SplyCur,IssContNtv,CapMrktCurUSD,PriceUSD,DiffMean"
+
+    # fetch the metrics, following next_page_token until the last page
+    rows = []
+    for start, end in ranges:
+        parameters = {
+            "assets": symbol,
+            "metrics": metrics,
+            "start_time": start.strftime("%Y-%m-%d"),
+            "end_time": end.strftime("%Y-%m-%d"),
+            "frequency": "1d",
+            "page_size": COINMETRICS_PAGE_SIZE,
+        }
+        while True:
+            page = get_json("coinmetrics", COINMETRICS_URL, parameters)
+            if "data" not in page:
+                raise UpstreamPayloadError(COINMETRICS_URL, page.get("error"))
+            rows.extend(page["data"])
+            if "next_page_token" not in page:
+                break
+            parameters["next_page_token"] = page["next_page_token"]
+
+    return rows
 
-            data.index = pd.to_datetime(data.index)
-            data.rename(
-                columns={"SplyCur": "tsupply", "IssContNtv": "issuance"}, inplace=True
-            )
-            data = data.astype(
-                {
-                    "tsupply": "float",
-                    "issuance": "float",
-                    "CapMrktCurUSD": "float",
-                    "DiffMean": "float",
-                }
-            )
-            return data
-        except Exception as e:
-            print("An coinmetrics error occurred:", e)
-            return None
 
-    filename = f"{symbol}_S2F_data.parquet"
-    if os.path.exists(filename):
-        # Load the data from the parquet file
-        df = pd.read_parquet(filename)
+def get_coinmetrics_data(symbol):
 
+    def is_fresh(df):
         # Get the current date and time
         time_now = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+        return df.index[-1].strftime("%Y-%m-%d") == time_now
 
-        last_date = df.index[-1]
-        if last_date.strftime("%Y-%m-%d") == time_now:
-            return df
-        else:
-            # Get the new data
-            new_df = get_data(symbol, last_date)
+    dataset = f"{symbol}_S2F_data"
+    # Histories saved before the partitioned store existed are imported once
+    migrate_legacy_file(dataset, f"{dataset}.parquet")
 
-            # Append the new data to the existing data
-            df = pd.concat([df, new_df]).sort_index()
-            df = df[~df.index.duplicated(keep="last")]
-            # Save the updated data to the parquet file
-            df.to_parquet(filename)
+    # Load the data from the history store
+    df = read_history_mapped(dataset) if history_exists(dataset) else None
+    if df is not None and is_fresh(df):
+        return df
 
+    with single_flight(history_path(dataset), have_previous=df is not None) as refresh:
+        if not refresh:
+            # Another worker is refreshing the data, serve the previous version
             return df
 
-    else:
-        df = get_data(symbol)
-
-        df = df[~df.index.duplicated(keep="last")]
+        # Another worker may have refreshed the data while we waited for the lock
+        if history_exists(dataset):
+            df = read_history_mapped(dataset)
+            if is_fresh(df):
+                return df
+
+        if df is not None:
+            # Get only the days missing from the stored history
+            yesterday = pd.Timestamp(datetime.now().date() - timedelta(days=1))
+            try:
+                new_df = coinmetrics_frame(
+                    fetch_coinmetrics_rows(symbol, missing_ranges(df.index, yesterday))
+                )
+            except UpstreamError as e:
+                # Serve the stored history rather than failing the render
+                print("A coinmetrics error occurred, serving stored data:", e)
+                return df
+
+            # Append only the new rows to the history store
+            append_history(dataset, new_df)
+            if new_df is not None:
+                df = combine_history([df, new_df])
+        else:
+            df = coinmetrics_frame(fetch_coinmetrics_rows(symbol))
+            if df is None:
+                raise UpstreamPayloadError(COINMETRICS_URL, f"no data for {symbol}")
 
-        # Drop rows where all values are 0.0
-        df = df.loc[~(df == 0.0).all(axis=1)]
+            # Drop rows where all values are 0.0
+            df = df.loc[~(df == 0.0).all(axis=1)]
 
-        df.to_parquet(filename)
-        return df
+            write_history(dataset, df)
+    return df
 
 
 # Example usage
@@ -0,0 +1,220 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from data.locking import atomic_write_parquet, file_lock
+
+# Each dataset is a directory of parquet partitions, one per period:
+#
+#   history/BTC_USD_data/2023.parquet               compacted partition
+#   history/BTC_USD_data/2024.parquet
+#   history/BTC_USD_data/2024.delta-<ns>.parquet    rows appended since compaction
+#
+# Appends only write the new rows as a delta file. Compaction folds deltas
+# back into their partition in a background thread. A full history is written
+# to a hidden directory beside the dataset and renamed into place, so readers
+# never see some of its partitions without the rest.
+HISTORY_DIR = "history"
+
+# Compact a partition once it has collected this many delta files
+COMPACT_AFTER = 8
+
+_PART_RE = re.compile(
+    r"^(?P<period>\d{4}(?:-\d{2})?)(?:\.delta-(?P<seq>\d+))?\.parquet$"
+)
+
+
+def history_path(dataset):
+    return os.path.join(HISTORY_DIR, dataset)
+
+
+def history_exists(dataset):
+    path = history_path(dataset)
+    return os.path.isdir(path) and any(_PART_RE.match(f) for f in os.listdir(path))
+
+
+def history_version(dataset):
+    """Cheap fingerprint that changes whenever a partition file is written."""
+    try:
+        stat = os.stat(history_path(dataset))
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, len(os.listdir(history_path(dataset))))
+
+
+def _period_keys(index, freq):
+    if freq == "M":
+        return index.strftime("%Y-%m")
+    return index.strftime("%Y")
+
+
+def _list_parts(path):
+    # {period: (base file or None, [delta files in append order])}
+    parts = {}
+    for name in os.listdir(path):
+        match = _PART_RE.match(name)
+        if match is None:
+            continue
+        base, deltas = parts.setdefault(match["period"], (None, []))
+        if match["seq"] is None:
+            parts[match["period"]] = (name, deltas)
+        else:
+            deltas.append(name)
+    for base, deltas in parts.values():
+        deltas.sort(key=lambda name: int(_PART_RE.match(name)["seq"]))
+    return dict(sorted(parts.items()))
+
+
+def combine_history(frames):
+    """Concatenate history frames into one sorted frame, later rows winning."""
+    df = pd.concat(frames) if len(frames) > 1 else frames[0]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind="stable")
+    if df.index.has_duplicates:
+        df = df[~df.index.duplicated(keep="last")]
+    return df
+
+
+def read_history(dataset, start=None, end=None):
+    """Read a dataset back as one sorted, de-duplicated frame.
+
+    ``start``/``end`` are period keys ("2021" or "2021-06") that limit which
+    partitions are read.
+    """
+    path = history_path(dataset)
+    for _ in range(3):
+        files = []
+        for period, (base, deltas) in _list_parts(path).items():
+            if start is not None and period < start:
+                continue
+            if end is not None and period > end:
+                continue
+            files.extend(f for f in [base] + deltas if f is not None)
+        try:
+            frames = [pd.read_parquet(os.path.join(path, f)) for f in files]
+        except FileNotFoundError:
+            # A compaction folded a delta away under us, list again
+            continue
+        return combine_history(frames) if frames else None
+    raise RuntimeError(f"History store {path} kept changing while being read")
+
+
+def iter_history(dataset):
+    """Yield a dataset one partition at a time, oldest first.
+
+    Only one period's rows are in memory at once, so minute histories of
+    millions of rows can be aggregated without loading them whole.
+    """
+    path = history_path(dataset)
+    for period in _list_parts(path):
+        df = read_history(dataset, start=period, end=period)
+        if df is not None:
+            yield df
+
+
+def last_period(dataset):
+    """Key of the newest partition, or None for an empty dataset."""
+    path = history_path(dataset)
+    if not os.path.isdir(path):
+        return None
+    periods = list(_list_parts(path))
+    return periods[-1] if periods else None
+
+
+def write_history(dataset, df, freq="Y"):
+    """Write a full history, one compacted partition per period.
+
+    Replaces whatever the dataset held. The partitions become visible
+    together, when their directory is renamed into place.
+    """
+    path = history_path(dataset)
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=HISTORY_DIR, prefix=f".{dataset}.", suffix=".tmp")
+    try:
+        for period, part in df.groupby(_period_keys(df.index, freq), sort=True):
+            part.to_parquet(os.path.join(tmp_path, f"{period}.parquet"))
+        try:
+            # Renaming over a missing or empty directory is atomic
+            os.replace(tmp_path, path)
+        except OSError:
+            # Move what is there aside first, left over from an earlier write
+            old_path = tempfile.mkdtemp(
+                dir=HISTORY_DIR, prefix=f".{dataset}.", suffix=".old"
+            )
+            os.replace(path, os.path.join(old_path, dataset))
+            os.replace(tmp_path, path)
+            shutil.rmtree(old_path, ignore_errors=True)
+    finally:
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def append_history(dataset, new_df, freq="Y", compact=True):
+    """Append rows as delta files, leaving existing partitions untouched.
+
+    Rows whose index already exists win over the stored ones on read, so a
+    re-fetched, still-open bar simply replaces its earlier version.
+    """
+    if new_df is None or new_df.empty:
+        return
+    path = history_path(dataset)
+    os.makedirs(path, exist_ok=True)
+    seq = time.time_ns()
+    for period, part in new_df.groupby(_period_keys(new_df.index, freq), sort=True):
+        atomic_write_parquet(part, os.path.join(path, f"{period}.delta-{seq}.parquet"))
+
+    if compact and any(
+        len(deltas) >= COMPACT_AFTER for _, deltas in _list_parts(path).values()
+    ):
+        compact_history(dataset, background=True)
+
+
+def compact_history(dataset, background=False):
+    """Fold every partition's delta files into its base file."""
+    if background:
+        thread = threading.Thread(
+            target=compact_history, args=(dataset,), name=f"compact-{dataset}"
+        )
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    path = history_path(dataset)
+    with file_lock(os.path.join(path, "compaction"), blocking=False) as acquired:
+        if not acquired:
+            # Another worker is already compacting this dataset
+            return None
+        for period, (base, deltas) in _list_parts(path).items():
+            if not deltas:
+                continue
+            files = [f for f in [base] + deltas if f is not None]
+            merged = combine_history(
+                [pd.read_parquet(os.path.join(path, f)) for f in files]
+            )
+            # Replace the base first, readers that still see the deltas get
+            # identical rows from both
+            atomic_write_parquet(merged, os.path.join(path, f"{period}.parquet"))
+            for delta in deltas:
+                os.remove(os.path.join(path, delta))
+    return None
+
+
+def migrate_legacy_file(dataset, filename, freq="Y", read=pd.read_parquet):
+    """Split a legacy single-file parquet history into partitions, once.
+
+    Runs under the dataset's refresh lock, so no other worker fetches the
+    history while it is being imported.
+    """
+    if history_exists(dataset) or not os.path.exists(filename):
+        return False
+    with file_lock(history_path(dataset)):
+        if history_exists(dataset):
+            # Another worker migrated it while we waited
+            return False
+        write_history(dataset, read(filename), freq=freq)
+    return True
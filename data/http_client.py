@@ -0,0 +1,176 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import retry, retry_if_exception, wait_random_exponential
+
+# (connect, read) timeouts in seconds; the read timeout bounds each wait for
+# data, not a whole response. Attempts, backoff and timeouts together never
+# run past a deadline: FETCH_DEADLINE for a fetch that makes several
+# requests (see fetch_deadline), or for a single get_json call outside one.
+# That leaves a request that has to fetch data inside gunicorn's 30 s worker
+# timeout. No attempt starts with less than MIN_ATTEMPT_SECONDS left.
+TIMEOUT = (3.05, 10)
+MAX_ATTEMPTS = 4
+FETCH_DEADLINE = 20
+MIN_ATTEMPT_SECONDS = 1
+
+# Concurrent requests allowed per upstream host from one process
+MAX_CONNECTIONS_PER_HOST = 4
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """An upstream data source could not deliver a usable response."""
+
+    def __init__(self, url, message):
+        super().__init__(f"{url}: {message}")
+        self.url = url
+
+
+class UpstreamTimeout(UpstreamError):
+    """The upstream did not connect or answer within TIMEOUT."""
+
+
+class UpstreamConnectionError(UpstreamError):
+    """The connection to the upstream could not be made or was dropped."""
+
+
+class UpstreamHTTPError(UpstreamError):
+    """The upstream answered with an HTTP error status."""
+
+    def __init__(self, url, status_code, message=""):
+        super().__init__(url, f"HTTP {status_code} {message}".strip())
+        self.status_code = status_code
+
+    @property
+    def retryable(self):
+        return self.status_code in RETRY_STATUS_CODES
+
+
+class UpstreamPayloadError(UpstreamError):
+    """The upstream answered, but the body is not the payload we expected."""
+
+
+_sessions = {}
+_semaphores = {}
+_lock = threading.Lock()
+# Deadline of the fetch running in each thread
+_local = threading.local()
+
+
+@contextmanager
+def fetch_deadline(seconds=FETCH_DEADLINE):
+    """Let every request made in the block take ``seconds`` in all.
+
+    Also works as a decorator. Nested blocks keep the earliest deadline.
+    """
+    previous = getattr(_local, "deadline", None)
+    deadline = time.monotonic() + seconds
+    _local.deadline = deadline if previous is None else min(previous, deadline)
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def _remaining():
+    return _local.deadline - time.monotonic()
+
+
+def get_session(upstream):
+    """Pooled keep-alive session shared by every request to one upstream."""
+    with _lock:
+        session = _sessions.get(upstream)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=MAX_CONNECTIONS_PER_HOST
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[upstream] = session
+        return session
+
+
+def _host_semaphore(url):
+    host = urlparse(url).netloc
+    with _lock:
+        semaphore = _semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST)
+            _semaphores[host] = semaphore
+        return semaphore
+
+
+def _is_retryable(error):
+    if isinstance(error, UpstreamHTTPError):
+        return error.retryable
+    return isinstance(error, (UpstreamTimeout, UpstreamConnectionError))
+
+
+def _stop(retry_state):
+    return (
+        retry_state.attempt_number >= MAX_ATTEMPTS or _remaining() < MIN_ATTEMPT_SECONDS
+    )
+
+
+_backoff = wait_random_exponential(multiplier=0.5, max=8)
+
+
+def _wait(retry_state):
+    # Back off, but never sleep past the deadline
+    return max(0.0, min(_backoff(retry_state), _remaining() - MIN_ATTEMPT_SECONDS))
+
+
+@retry(
+    retry=retry_if_exception(_is_retryable),
+    stop=_stop,
+    wait=_wait,
+    reraise=True,
+)
+def _get(upstream, url, params):
+    session = get_session(upstream)
+    with _host_semaphore(url):
+        # Waiting for a connection slot counts against the deadline too
+        remaining = _remaining()
+        if remaining <= 0:
+            raise UpstreamTimeout(url, "fetch deadline passed")
+        timeout = tuple(min(limit, remaining) for limit in TIMEOUT)
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+        except requests.Timeout as error:
+            raise UpstreamTimeout(url, str(error)) from error
+        except (
+            requests.ConnectionError,
+            requests.exceptions.ChunkedEncodingError,
+        ) as error:
+            # Includes a connection dropped while the body was being read
+            raise UpstreamConnectionError(url, str(error)) from error
+        except requests.RequestException as error:
+            # Anything else requests raises, e.g. too many redirects
+            raise UpstreamError(url, f"{type(error).__name__}: {error}") from error
+
+    if response.status_code >= 400:
+        raise UpstreamHTTPError(url, response.status_code, response.reason or "")
+    try:
+        return orjson.loads(response.content)
+    except orjson.JSONDecodeError as error:
+        raise UpstreamPayloadError(url, f"invalid JSON: {error}") from error
+
+
+def get_json(upstream, url, params=None):
+    """GET ``url`` through the ``upstream`` session and return the decoded JSON.
+
+    Timeouts, dropped connections, 429 and 5xx responses are retried with
+    jittered exponential backoff, within the deadline of the enclosing
+    fetch_deadline block, or FETCH_DEADLINE outside one. Every failure
+    reaches the caller as an UpstreamError subclass.
+    """
+    with fetch_deadline():
+        return _get(upstream, url, params)
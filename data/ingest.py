@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+# CryptoCompare histo* bar fields and the column each one is stored under
+CRYPTOCOMPARE_FIELDS = {
+    "open": "Open",
+    "high": "High",
+    "low": "Low",
+    "close": "Close",
+    "volumefrom": "Volume",
+}
+
+# CoinMetrics metrics renamed and cast to float on ingest. PriceUSD stays a
+# string column, matching the histories stored before this module existed.
+COINMETRICS_RENAMES = {"SplyCur": "tsupply", "IssContNtv": "issuance"}
+COINMETRICS_FLOAT_METRICS = {"SplyCur", "IssContNtv", "CapMrktCurUSD", "DiffMean"}
+
+
+def _column(entries, field, dtype):
+    return np.fromiter((entry[field] for entry in entries), dtype, len(entries))
+
+
+def cryptocompare_frame(entries):
+    """Build an OHLCV frame from decoded CryptoCompare bars, column by column."""
+    times = _column(entries, "time", np.int64)
+    index = pd.DatetimeIndex(pd.to_datetime(times, unit="s", utc=True), name="Date")
+    return pd.DataFrame(
+        {
+            column: _column(entries, field, np.float64)
+            for field, column in CRYPTOCOMPARE_FIELDS.items()
+        },
+        index=index,
+    )
+
+
+def coinmetrics_frame(rows):
+    """Build a daily metrics frame from decoded CoinMetrics rows."""
+    if not rows:
+        return None
+
+    times = pd.to_datetime(np.array([row["time"] for row in rows]), utc=True)
+    # Daily rows, stored against a naive UTC date index
+    index = pd.DatetimeIndex(times.tz_convert(None).normalize(), name="time")
+
+    # CoinMetrics leaves out metrics a day has no value for, so the columns
+    # are the union across rows (in first-seen order) with gaps left as NaN
+    columns = {}
+    for key in dict.fromkeys(key for row in rows for key in row):
+        if key == "time":
+            continue
+        values = np.array([row.get(key, np.nan) for row in rows], dtype=object)
+        if key in COINMETRICS_FLOAT_METRICS:
+            values = pd.to_numeric(values, errors="coerce").astype(np.float64)
+        columns[COINMETRICS_RENAMES.get(key, key)] = values
+
+    df = pd.DataFrame(columns, index=index)
+    # Keep the first row of any day CoinMetrics sends twice
+    return df[~df.index.duplicated(keep="first")]
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+# Bitcoin's issuance schedule: a 50 BTC subsidy halving every 210,000 blocks,
+# with blocks targeted at one every ten minutes
+GENESIS_DATE = pd.Timestamp("2009-01-03")
+INITIAL_SUBSIDY = 50.0
+HALVING_INTERVAL = 210_000
+BLOCKS_PER_DAY = 144
+
+
+def block_subsidy(heights):
+    """Subsidy paid by the block at each height."""
+    eras = np.asarray(heights) // HALVING_INTERVAL
+    return INITIAL_SUBSIDY / 2.0**eras
+
+
+def supply_at_height(heights):
+    """Total coins issued once the block at each height has been mined."""
+    heights = np.asarray(heights, dtype=np.int64)
+    eras = heights // HALVING_INTERVAL
+    # Every completed era issued HALVING_INTERVAL * its subsidy, a geometric sum
+    completed = INITIAL_SUBSIDY * HALVING_INTERVAL * 2.0 * (1.0 - 0.5**eras)
+    return completed + (heights % HALVING_INTERVAL + 1) * block_subsidy(heights)
+
+
+def estimated_height(dates):
+    """Block height expected on each date at the target block rate."""
+    days = (pd.DatetimeIndex(dates) - GENESIS_DATE).days.to_numpy()
+    return np.maximum(days, 0) * BLOCKS_PER_DAY
+
+
+def halving_dates(after, count=3, reference_date=None, reference_height=None):
+    """Estimated dates of the next ``count`` halvings after ``after``.
+
+    Projects from ``reference_height`` on ``reference_date`` when given,
+    otherwise from the target block rate since genesis.
+    """
+    if reference_date is None:
+        reference_date = pd.Timestamp(after)
+        reference_height = int(estimated_height([reference_date])[0])
+    next_era = reference_height // HALVING_INTERVAL + 1
+    dates = []
+    for era in range(next_era, next_era + count):
+        blocks_left = era * HALVING_INTERVAL - reference_height
+        dates.append(
+            pd.Timestamp(reference_date)
+            + pd.Timedelta(days=blocks_left / BLOCKS_PER_DAY)
+        )
+    return [date.normalize() for date in dates if date > pd.Timestamp(after)]
+
+
+def halving_cycle_years(phase, until_year):
+    """Years ``phase`` years into an issuance era, up to ``until_year``.
+
+    Eras start at genesis and at each estimated halving, so phase 0 picks the
+    halving years (2012, 2016, ...) and phase 1 the years after them.
+    """
+    era_count = (until_year - GENESIS_DATE.year) // 4 + 2
+    starts = [GENESIS_DATE.year]
+    starts += [date.year for date in halving_dates(GENESIS_DATE, count=era_count)]
+    return tuple(
+        start + phase
+        for start, end in zip(starts, starts[1:])
+        if start + phase < end and start + phase <= until_year
+    )
+
+
+def height_at_supply(supply):
+    """Block height at which ``supply`` coins had been issued.
+
+    The inverse of supply_at_height, used to place a measured supply on the
+    schedule.
+    """
+    supply = np.asarray(supply, dtype=np.float64)
+    eras = np.arange(64)
+    # Coins issued before each era starts
+    era_starts = INITIAL_SUBSIDY * HALVING_INTERVAL * 2.0 * (1.0 - 0.5**eras)
+    era = np.searchsorted(era_starts, supply, side="right") - 1
+    blocks = (supply - era_starts[era]) / block_subsidy(era * HALVING_INTERVAL)
+    return np.maximum(era * HALVING_INTERVAL + np.round(blocks).astype(np.int64) - 1, 0)
+
+
+def projected_issuance(reference_date, reference_supply, until):
+    """Daily dates, supply and issuance from ``reference_date`` to ``until``.
+
+    Follows the schedule on from the height at which ``reference_supply``
+    had been issued, at the target block rate. Each day's issuance is the
+    supply its blocks add, so days spanning a halving are split correctly.
+    """
+    dates = pd.date_range(
+        pd.Timestamp(reference_date) + pd.Timedelta(days=1), until, freq="D"
+    )
+    height = int(height_at_supply(reference_supply))
+    heights = height + np.arange(1, len(dates) + 1) * BLOCKS_PER_DAY
+    supply = supply_at_height(heights)
+    issuance = supply - supply_at_height(heights - BLOCKS_PER_DAY)
+    return dates, supply, issuance
@@ -0,0 +1,67 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows dev setups run a single process, so no lock needed
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """Hold an exclusive cross-process lock on ``path + ".lock"``.
+
+    Yields True once the lock is held. With ``blocking=False`` it yields False
+    straight away if another process already holds the lock.
+    """
+    if fcntl is None:
+        yield True
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", "a+") as lock_file:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock_file.fileno(), flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def single_flight(path, have_previous):
+    """Make sure only one process refreshes ``path`` at a time.
+
+    Yields True when the caller holds the lock and should refresh. If another
+    process is already refreshing and a previous version exists, yields False
+    so the caller can serve that version. Without a previous version, waits
+    for the other process to finish and then yields True. The caller should
+    re-check freshness, because the file may have been refreshed meanwhile.
+    """
+    with file_lock(path, blocking=not have_previous) as acquired:
+        if acquired or not have_previous:
+            yield True
+            return
+    # Lock was busy: let the caller serve what it already has
+    yield False
+
+
+def atomic_write_parquet(df, filename):
+    """Write ``df`` to a temp file next to ``filename`` and rename it into place."""
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(filename)}.", suffix=".tmp"
+    )
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
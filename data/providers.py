@@ -0,0 +1,291 @@
+import os
+import threading
+import zlib
+from abc import ABC, abstractmethod
+
+import numpy as np
+import orjson
+import pandas as pd
+
+from data.frame_store import (
+    fingerprint,
+    frame_view,
+    freeze_frame,
+    get_coinmetrics_frame,
+    get_historical_frame,
+    invalidate,
+    stored_fingerprint,
+)
+from data.get_historical_data import fetch_coinmetrics_rows, fetch_cryptocompare_bars
+from data.history_store import history_exists
+from data.ingest import coinmetrics_frame, cryptocompare_frame
+from data.issuance import (
+    BLOCKS_PER_DAY,
+    block_subsidy,
+    estimated_height,
+    supply_at_height,
+)
+from data.resample import (
+    resample_ohlcv,
+    source_timeframe,
+    timeframe_delta,
+    timeframe_rule,
+)
+
+# Symbols offered by the dashboard's selector
+SYMBOLS = ("BTC", "ETH", "SOL", "XRP", "BNB", "LTC")
+
+
+class DataProvider(ABC):
+    """Source of the frames every indicator is built from.
+
+    get_historical_data returns an OHLCV frame on a UTC index, daily unless
+    another ``timeframe`` ("1h", "4h", "1w", ...) is asked for, and
+    get_coinmetrics_data a daily supply/issuance frame on a naive index. Both
+    have the same schema as data.get_historical_data, and callers must treat
+    them as read-only.
+    """
+
+    @abstractmethod
+    def get_historical_data(self, symbol, currency, timeframe="1d"):
+        pass
+
+    @abstractmethod
+    def get_coinmetrics_data(self, symbol):
+        pass
+
+    @abstractmethod
+    def data_fingerprint(self, symbol, currency=None):
+        """Row count and last date of the daily data, as a string.
+
+        The OHLCV data of ``currency``, or the CoinMetrics data when it is
+        None. Never fetches anything, so it is cheap enough to key caches
+        on.
+        """
+
+    def refresh(self, symbol, currency="USD"):
+        """Reload ``symbol``'s data, fetching whatever is new upstream."""
+
+
+class LiveProvider(DataProvider):
+    """CryptoCompare and CoinMetrics through the history and frame stores."""
+
+    def get_historical_data(self, symbol, currency, timeframe="1d"):
+        return get_historical_frame(symbol, currency, timeframe)
+
+    def get_coinmetrics_data(self, symbol):
+        return get_coinmetrics_frame(symbol)
+
+    def data_fingerprint(self, symbol, currency=None):
+        return stored_fingerprint(symbol, currency)
+
+    def refresh(self, symbol, currency="USD"):
+        invalidate(symbol, currency)
+        get_historical_frame(symbol, currency)
+        # CoinMetrics data is only kept for symbols a chart has asked for
+        if history_exists(f"{symbol}_S2F_data"):
+            get_coinmetrics_frame(symbol)
+
+    def __repr__(self):
+        return "LiveProvider()"
+
+
+class _CachingProvider(DataProvider):
+    # Builds each frame once, then hands out read-only views of it
+
+    def __init__(self):
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key, build):
+        with self._lock:
+            if key not in self._frames:
+                self._frames[key] = freeze_frame(build())
+            return frame_view(self._frames[key])
+
+    @abstractmethod
+    def _build_ohlcv(self, symbol, currency, timeframe):
+        pass
+
+    @abstractmethod
+    def _build_coinmetrics(self, symbol):
+        pass
+
+    def get_historical_data(self, symbol, currency, timeframe="1d"):
+        return self._cached(
+            ("ohlcv", symbol, currency, timeframe),
+            lambda: self._build_ohlcv(symbol, currency, timeframe),
+        )
+
+    def get_coinmetrics_data(self, symbol):
+        return self._cached(("S2F", symbol), lambda: self._build_coinmetrics(symbol))
+
+    def data_fingerprint(self, symbol, currency=None):
+        if currency is None:
+            return fingerprint(self.get_coinmetrics_data(symbol))
+        return fingerprint(self.get_historical_data(symbol, currency))
+
+    def refresh(self, symbol, currency="USD"):
+        with self._lock:
+            for key in list(self._frames):
+                if key[1] == symbol:
+                    del self._frames[key]
+
+
+class ReplayProvider(_CachingProvider):
+    """Replays upstream responses saved by record_responses.
+
+    ``directory`` holds the raw CryptoCompare bars and CoinMetrics rows as
+    cryptocompare/<symbol>_<currency>.json (daily bars),
+    cryptocompare/<symbol>_<currency>_<1h|1m>.json (intraday bars) and
+    coinmetrics/<symbol>.json. They go through the same ingest code as live
+    responses, and other timeframes are resampled from them.
+    """
+
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+
+    def _load(self, *parts):
+        with open(os.path.join(self.directory, *parts), "rb") as f:
+            return orjson.loads(f.read())
+
+    def _build_ohlcv(self, symbol, currency, timeframe):
+        source = source_timeframe(timeframe)
+        name = f"{symbol}_{currency}.json"
+        if source != "1d":
+            name = f"{symbol}_{currency}_{source}.json"
+        df = cryptocompare_frame(self._load("cryptocompare", name))
+        # Drop rows where all values are 0.0, as the live loader does
+        df = df.loc[~(df == 0.0).all(axis=1)]
+        if timeframe == source:
+            return df
+        return resample_ohlcv([df], timeframe)
+
+    def _build_coinmetrics(self, symbol):
+        return coinmetrics_frame(self._load("coinmetrics", f"{symbol}.json"))
+
+    def __repr__(self):
+        return f"ReplayProvider({self.directory!r})"
+
+
+class SyntheticProvider(_CachingProvider):
+    """Generated OHLCV and supply histories of a chosen length.
+
+    The same ``seed`` always produces the same data. Each symbol gets its own
+    stream derived from it. Histories end today, like live data, so the
+    year-to-date and seasonality charts have something to show.
+    """
+
+    def __init__(self, length=5000, seed=0):
+        super().__init__()
+        self.length = length
+        self.seed = seed
+
+    def _rng(self, symbol):
+        return np.random.default_rng([self.seed, zlib.crc32(symbol.encode())])
+
+    def _build_ohlcv(self, symbol, currency, timeframe="1d"):
+        rng = self._rng(symbol)
+        rule = timeframe_rule(timeframe)
+        end = pd.Timestamp.now(tz="UTC").floor(rule if rule[-1] != "W" else "D")
+        index = pd.date_range(end=end, periods=self.length, freq=rule, name="Date")
+
+        # Geometric random walk with a positive drift, like a young crypto
+        # asset, scaled to the bar size. ``length`` counts bars.
+        days = timeframe_delta(timeframe) / pd.Timedelta(days=1)
+        log_returns = rng.normal(0.0015 * days, 0.04 * np.sqrt(days), self.length)
+        close = 0.05 * np.exp(np.cumsum(log_returns))
+        open_ = np.concatenate([[close[0]], close[:-1]])
+        wick = np.abs(rng.normal(0.0, 0.02, (2, self.length)))
+        high = np.maximum(open_, close) * (1.0 + wick[0])
+        low = np.minimum(open_, close) * (1.0 - wick[1])
+        volume = rng.lognormal(10.0, 1.0, self.length)
+        return pd.DataFrame(
+            {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+            index=index,
+        )
+
+    def _build_coinmetrics(self, symbol):
+        rng = self._rng(symbol)
+        end = pd.Timestamp.now().normalize() - pd.Timedelta(days=1)
+        index = pd.date_range(end=end, periods=self.length, freq="D", name="time")
+
+        # Follow Bitcoin's issuance schedule, starting at the first block when
+        # the history reaches back past genesis
+        heights = estimated_height(index)
+        heights = heights - heights[0] + max(heights[0], BLOCKS_PER_DAY)
+        supply = supply_at_height(heights)
+        issuance = block_subsidy(heights) * BLOCKS_PER_DAY
+
+        price = self._build_ohlcv(symbol, "USD")["Close"].to_numpy()
+        difficulty = np.exp(np.linspace(0.0, 30.0, self.length))
+        difficulty *= rng.lognormal(0.0, 0.05, self.length)
+        return pd.DataFrame(
+            {
+                "asset": symbol.lower(),
+                "CapMrktCurUSD": supply * price,
+                "DiffMean": difficulty,
+                "issuance": issuance,
+                "PriceUSD": price.astype(str),
+                "tsupply": supply,
+            },
+            index=index,
+        )
+
+    def __repr__(self):
+        return f"SyntheticProvider(length={self.length}, seed={self.seed})"
+
+
+def record_responses(
+    directory,
+    symbols,
+    currency="USD",
+    coinmetrics_symbols=("BTC",),
+    timeframes=("1d",),
+):
+    """Save full upstream histories for ReplayProvider to play back."""
+    for subdir in ("cryptocompare", "coinmetrics"):
+        os.makedirs(os.path.join(directory, subdir), exist_ok=True)
+    for symbol in symbols:
+        for timeframe in timeframes:
+            bars = fetch_cryptocompare_bars(symbol, currency, timeframe=timeframe)
+            name = f"{symbol}_{currency}.json"
+            if timeframe != "1d":
+                name = f"{symbol}_{currency}_{timeframe}.json"
+            with open(os.path.join(directory, "cryptocompare", name), "wb") as f:
+                f.write(orjson.dumps(bars))
+    for symbol in coinmetrics_symbols:
+        rows = fetch_coinmetrics_rows(symbol)
+        with open(os.path.join(directory, "coinmetrics", f"{symbol}.json"), "wb") as f:
+            f.write(orjson.dumps(rows))
+
+
+def provider_from_spec(spec):
+    """Build a provider from "live", "synthetic[:length[:seed]]" or "replay:<dir>"."""
+    name, _, args = spec.partition(":")
+    if name == "live":
+        return LiveProvider()
+    if name == "synthetic":
+        values = [int(value) for value in args.split(":") if value]
+        return SyntheticProvider(*values)
+    if name == "replay":
+        return ReplayProvider(args)
+    raise ValueError(f"Unknown data provider {spec!r}")
+
+
+# Chosen once per process, e.g. VALATILITY_DATA_PROVIDER=synthetic:50000:1
+# to load-test the dashboard against a 10x history without network access
+_default_provider = provider_from_spec(
+    os.environ.get("VALATILITY_DATA_PROVIDER", "live")
+)
+
+
+def get_provider(provider=None):
+    """Return ``provider``, or the process-wide default when it is None."""
+    return _default_provider if provider is None else provider
+
+
+def set_default_provider(provider):
+    global _default_provider
+    _default_provider = provider
@@ -0,0 +1,108 @@
+import re
+
+import pandas as pd
+
+# How each OHLCV column combines when bars are merged into a coarser bar
+OHLCV_AGG = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Volume": "sum",
+}
+
+# Bar sizes kept in the history store, finest last
+STORED_TIMEFRAMES = {"1d": "D", "1h": "H", "1m": "T"}
+
+_TIMEFRAME_RE = re.compile(r"^(?P<count>\d+)(?P<unit>[mhdw])$")
+_UNIT_RULES = {"m": "T", "h": "H", "d": "D", "w": "W"}
+_UNIT_DELTAS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+# Bars are binned from a fixed origin, so every chunk of a history puts its
+# bars in the same bins whatever time it starts at. Weeks run Monday to
+# Sunday, as in pandas' "W"; 1970-01-05 is a Monday.
+EPOCH = pd.Timestamp("1970-01-01", tz="UTC")
+WEEK_EPOCH = pd.Timestamp("1970-01-05", tz="UTC")
+
+
+def _parse(timeframe):
+    match = _TIMEFRAME_RE.match(timeframe)
+    if match is None:
+        raise ValueError(f"Unknown timeframe {timeframe!r}")
+    return int(match["count"]), match["unit"]
+
+
+def timeframe_rule(timeframe):
+    """Pandas offset alias for a timeframe such as "15m", "4h", "1d" or "1w"."""
+    count, unit = _parse(timeframe)
+    return f"{count}{_UNIT_RULES[unit]}"
+
+
+def timeframe_delta(timeframe):
+    """Length of one bar of ``timeframe`` (weeks count as seven days)."""
+    count, unit = _parse(timeframe)
+    return pd.Timedelta(**{_UNIT_DELTAS[unit]: count})
+
+
+def _bins(timeframe, tz):
+    # resample() arguments putting bars in fixed bins, and the shift from a
+    # bin's start to its label. Weeks become 7-day bins from a Monday,
+    # labelled with their last day as "W" labels them, so "1w" matches
+    # pandas' "W" and longer weeks keep one phase. (A Sunday origin with
+    # closed="right" would say the same, but pandas 1.5 rejects it.)
+    count, unit = _parse(timeframe)
+    if unit == "w":
+        rule, origin = f"{7 * count}D", WEEK_EPOCH
+        shift = pd.Timedelta(days=7 * count - 1)
+    else:
+        rule, origin = timeframe_rule(timeframe), EPOCH
+        shift = pd.Timedelta(0)
+    return {"rule": rule, "origin": origin.tz_convert(tz)}, shift
+
+
+def source_timeframe(timeframe):
+    """The coarsest stored bar size that ``timeframe`` can be built from."""
+    delta = timeframe_delta(timeframe)
+    for stored, freq in STORED_TIMEFRAMES.items():
+        step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+        if delta >= step and delta % step == pd.Timedelta(0):
+            return stored
+    raise ValueError(f"Timeframe {timeframe!r} is finer than any stored bars")
+
+
+def resample_ohlcv(chunks, timeframe):
+    """Aggregate time-ordered OHLCV chunks into ``timeframe`` bars, streaming.
+
+    Each chunk is aggregated on its own, in bins counted from a fixed origin
+    so they line up across chunks. The last bar of a chunk may still be open,
+    because the next chunk can continue the same bin, so it is carried over
+    and merged with the next chunk's first bar. Only one chunk and one
+    carried bar are held in memory at a time.
+    """
+    bars = []
+    carry = None
+    for chunk in chunks:
+        bins, label_shift = _bins(timeframe, chunk.index.tz)
+        agg = chunk.resample(**bins).agg(OHLCV_AGG).dropna(subset=["Close"])
+        agg.index += label_shift
+        if agg.empty:
+            continue
+        if carry is not None:
+            if agg.index[0] == carry.index[0]:
+                first = agg.iloc[[0]]
+                carry = carry.assign(
+                    High=max(carry["High"].iat[0], first["High"].iat[0]),
+                    Low=min(carry["Low"].iat[0], first["Low"].iat[0]),
+                    Close=first["Close"].iat[0],
+                    Volume=carry["Volume"].iat[0] + first["Volume"].iat[0],
+                )
+                agg = pd.concat([carry, agg.iloc[1:]])
+            else:
+                bars.append(carry)
+        bars.append(agg.iloc[:-1])
+        carry = agg.iloc[[-1]]
+    if carry is not None:
+        bars.append(carry)
+    if not bars:
+        return None
+    return pd.concat(bars)
@@ -0,0 +1,197 @@
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import orjson
+import pandas as pd
+import plotly.io as pio
+
+from data.locking import file_lock
+from data.providers import get_provider
+
+# Finished figures stored as gzip-compressed JSON, one file per figure:
+#
+#   figures/<sha1 of chart, symbol, arguments and data version>.json.gz
+#
+# A hit decompresses the bytes and parses them with orjson into the plain
+# dict Dash sends to the browser; no Plotly figure is built or validated.
+# The directory is shared by every gunicorn worker.
+#
+# The data version is a fingerprint of the data the figure was built from,
+# so new data simply gets new keys and nothing has to be cleared. Figures
+# no longer asked for are deleted once they are older than FIGURE_TIMEOUT.
+#
+# Resampled figures (see resampling.py) also keep the full resolution x and
+# y arrays of their traces next to the JSON, for re-aggregating on zoom:
+#
+#   figures/<key>.traces.npz
+#
+# They are plain numeric arrays, read back without unpickling anything.
+#
+# A figure being built holds a lock file, figures/locks/<key>.lock, so
+# identical builds in other processes wait for it instead of repeating it.
+# Lock files are pruned with the figures.
+FIGURE_DIR = "figures"
+LOCK_DIR = os.path.join(FIGURE_DIR, "locks")
+FIGURE_TIMEOUT = 3600
+SUFFIXES = (".json.gz", ".traces.npz")
+
+_last_prune = 0.0
+
+
+def figure_key(func, symbol, currency="USD", provider=None, version=None, **kwargs):
+    """Cache key of ``func``'s figure for these arguments and data version."""
+    parts = [
+        func.__module__,
+        func.__name__,
+        symbol,
+        currency,
+        repr(get_provider(provider)),
+        repr(version),
+        repr(sorted(kwargs.items())),
+    ]
+    return hashlib.sha1("\0".join(parts).encode()).hexdigest()
+
+
+def _path(key, suffix=".json.gz"):
+    return os.path.join(FIGURE_DIR, key + suffix)
+
+
+def _read(path):
+    # The file's bytes, or None if missing or older than the timeout
+    try:
+        if time.time() - os.path.getmtime(path) > FIGURE_TIMEOUT:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write(path, data):
+    os.makedirs(FIGURE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=FIGURE_DIR, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    prune_figures()
+
+
+def figure_lock(key, blocking=True):
+    """Cross-process lock held while the figure of ``key`` is built."""
+    return file_lock(os.path.join(LOCK_DIR, key), blocking)
+
+
+def load_figure(key):
+    """The stored figure as a dict, or None if missing or older than the timeout."""
+    data = _read(_path(key))
+    return None if data is None else orjson.loads(gzip.decompress(data))
+
+
+def store_figure(key, figure):
+    """Serialise ``figure`` once with orjson and store it compressed."""
+    _write(_path(key), gzip.compress(pio.to_json(figure, engine="orjson").encode(), 6))
+    return figure
+
+
+def store_traces(key, figure):
+    """Store the x and y arrays of ``figure``'s traces.
+
+    Dates are stored as UTC datetime64 with their time zone beside them.
+    Traces without numeric y values are left out.
+    """
+    arrays = {}
+    for i, trace in enumerate(figure.data):
+        if trace.x is None or trace.y is None:
+            continue
+        try:
+            y = np.asarray(trace.y, dtype=np.float64)
+        except (TypeError, ValueError):
+            continue
+        x, tz = np.asarray(trace.x), ""
+        if x.dtype == object or np.issubdtype(x.dtype, np.datetime64):
+            dates = pd.DatetimeIndex(x)
+            if dates.tz is not None:
+                tz, dates = str(dates.tz), dates.tz_convert(None)
+            x = dates.to_numpy()
+        arrays.update({f"x{i}": x, f"y{i}": y, f"tz{i}": np.array(tz)})
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    _write(_path(key, ".traces.npz"), buffer.getvalue())
+
+
+def load_traces(key):
+    """{trace number: (x, y)} stored for ``key``, or None if not stored."""
+    data = _read(_path(key, ".traces.npz"))
+    if data is None:
+        return None
+    traces = {}
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        for name in arrays.files:
+            if not name.startswith("x"):
+                continue
+            i = int(name[1:])
+            x, tz = arrays[name], str(arrays[f"tz{i}"])
+            if np.issubdtype(x.dtype, np.datetime64):
+                x = pd.DatetimeIndex(x)
+                if tz:
+                    x = x.tz_localize("UTC").tz_convert(tz)
+            traces[i] = (x, arrays[f"y{i}"])
+    return traces
+
+
+def prune_figures(max_age=FIGURE_TIMEOUT):
+    """Delete figures and free lock files older than ``max_age`` seconds.
+
+    Runs at most once per ``max_age / 10`` seconds in each process, so
+    calling it after every write is cheap.
+    """
+    global _last_prune
+    now = time.time()
+    if now - _last_prune < max_age / 10:
+        return
+    _last_prune = now
+    for path in _old_files(FIGURE_DIR, SUFFIXES, now - max_age):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Another worker pruned it first
+            pass
+    for path in _old_files(LOCK_DIR, ".lock", now - max_age):
+        # Only locks nobody holds. A build already waiting on a removed file
+        # may then run next to one locking its replacement, which only
+        # repeats the build.
+        with file_lock(path[: -len(".lock")], blocking=False) as acquired:
+            if acquired:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def _old_files(directory, suffixes, before):
+    # Paths in ``directory`` ending in ``suffixes``, last modified before ``before``
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    paths = []
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if name.endswith(suffixes) and os.path.getmtime(path) < before:
+                paths.append(path)
+        except FileNotFoundError:
+            pass
+    return paths
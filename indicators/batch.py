@@ -0,0 +1,147 @@
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from data.providers import SYMBOLS, get_provider
+from indicators import kernels
+from indicators.compute import NUPL, RAINBOW_OFFSETS, PiCycle, Rainbow
+from indicators.features import frozen
+
+# The indicators of indicators/compute.py for many symbols at once. Every
+# symbol's close is aligned into one symbols x days array on the union of
+# their dates, NaN where a symbol has no bar, and each indicator is a few
+# array operations along the last axis over the whole stack:
+#
+#   matrix = load_close_matrix(("BTC", "ETH", "SOL"))
+#   z = z_score(matrix.close)          # 3 x days
+#
+# A window only produces a value when every bar in it is present, so a
+# symbol's leading NaNs behave like the start of its own history. Results are
+# read-only float64 arrays aligned to ``matrix.dates``.
+CloseMatrix = namedtuple("CloseMatrix", ["symbols", "dates", "close"])
+
+
+def close_matrix(frames):
+    """Align the Close columns of ``frames``, a {symbol: frame} mapping."""
+    symbols = tuple(frames)
+    indexes = [frames[symbol].index for symbol in symbols]
+    dates = pd.DatetimeIndex(
+        np.unique(np.concatenate([index.asi8 for index in indexes])),
+        tz=indexes[0].tz,
+    )
+    close = np.full((len(symbols), len(dates)), np.nan)
+    for row, symbol in enumerate(symbols):
+        frame = frames[symbol]
+        close[row, dates.searchsorted(frame.index)] = frame["Close"].to_numpy()
+    return CloseMatrix(symbols, dates, frozen(close))
+
+
+def load_close_matrix(symbols=SYMBOLS, currency="USD", provider=None, timeframe="1d"):
+    """close_matrix over each symbol's history from ``provider``."""
+    provider = get_provider(provider)
+    return close_matrix(
+        {
+            symbol: provider.get_historical_data(symbol, currency, timeframe)
+            for symbol in symbols
+        }
+    )
+
+
+def _prefix(close, prefix):
+    return kernels.prefix_sums(close) if prefix is None else prefix
+
+
+def z_score(close, window=511, prefix=None):
+    """Distance of close from its rolling mean, in rolling std.
+
+    ``prefix``, the prefix sums of ``close``, is built when not given; pass
+    it to share one set between several windows.
+    """
+    mean, std = kernels.window_moments(_prefix(close, prefix), window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return frozen((close - mean) / std)
+
+
+def pi_cycle(close, fast=111, slow=350, multiplier=2.0, prefix=None):
+    """Fast SMA, slow SMA times ``multiplier``, and where fast is above it."""
+    prefix = _prefix(close, prefix)
+    fast_ma = kernels.window_moments(prefix, fast)[0]
+    slow_ma = kernels.window_moments(prefix, slow)[0] * multiplier
+    with np.errstate(invalid="ignore"):
+        highlight = fast_ma > slow_ma
+    return PiCycle(frozen(fast_ma), frozen(slow_ma), frozen(highlight, bool))
+
+
+def nupl(close, window=180, prefix=None):
+    """Relative unrealized profit/loss against a ``window``-bar SMA.
+
+    z_score standardises each symbol's NUPL over its own history.
+    """
+    realized_value = kernels.window_moments(_prefix(close, prefix), window)[0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        value = (close - realized_value) / close * 100
+    with warnings.catch_warnings():
+        # A symbol shorter than the window has no NUPL at all
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(value, axis=-1, keepdims=True)
+        std = np.nanstd(value, axis=-1, ddof=1, keepdims=True)
+    return NUPL(frozen(realized_value), frozen(value), frozen((value - mean) / std))
+
+
+def returns(close):
+    """Bar-over-bar percentage change, NaN for each symbol's first bar."""
+    changes = np.full(close.shape, np.nan)
+    changes[..., 1:] = close[..., 1:] / close[..., :-1] - 1
+    return changes
+
+
+def rolling_sharpe(close, windows, risk_free_rate=0.0, periods_per_year=365):
+    """Annualised rolling Sharpe ratios of returns.
+
+    The result is windows x symbols x days; every window is read off the
+    same prefix sums.
+    """
+    prefix = kernels.prefix_sums(returns(close))
+    return frozen(
+        kernels.rolling_sharpe(prefix, windows, risk_free_rate, periods_per_year)
+    )
+
+
+def rainbow(close, offsets=RAINBOW_OFFSETS):
+    """Rainbow bands around each symbol's log-linear fit of close.
+
+    ``bands`` is symbols x offsets x days and ``start`` holds the position
+    of each symbol's first bar. As in indicators.compute.rainbow, each band
+    after the first is scaled by the fair value's last value over its peak.
+    """
+    with np.errstate(divide="ignore"):
+        log_close = np.log(close)
+    slope, intercept, x = kernels.linear_fit(log_close)
+    valid = ~np.isnan(close)
+    fair_value = np.where(
+        valid, np.exp(intercept[:, None] + slope[:, None] * x), np.nan
+    )
+
+    with warnings.catch_warnings():
+        # A symbol without any bar has no fit
+        warnings.simplefilter("ignore", RuntimeWarning)
+        last = np.exp(intercept + slope * (valid.sum(axis=-1) - 1))
+        scale = np.repeat(
+            (last / np.nanmax(fair_value, axis=-1))[:, None], len(offsets), 1
+        )
+    scale[:, 0] = 1.0
+    bands = fair_value[:, None, :] * (np.exp(offsets) * scale)[:, :, None]
+    return Rainbow(frozen(valid.argmax(axis=-1), np.int64), frozen(bands))
+
+
+def compute_all(matrix, sharpe_windows=(60, 180, 360)):
+    """Every batch indicator over ``matrix`` with its default parameters."""
+    return {
+        "z_score": z_score(matrix.close),
+        "pi_cycle": pi_cycle(matrix.close),
+        "nupl": nupl(matrix.close),
+        "rolling_sharpe": rolling_sharpe(matrix.close, sharpe_windows),
+        "rainbow": rainbow(matrix.close),
+    }
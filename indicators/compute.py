@@ -0,0 +1,249 @@
+import warnings
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data import issuance
+from indicators import kernels, regression, seasonality, stock_to_flow
+from indicators.features import feature, frozen, indicator
+
+# The numbers behind each chart, kept apart from the Plotly code. Every
+# indicator reads the shared features of a symbol and returns new read-only
+# float64 arrays aligned to its index. Nothing here writes to the frame, so
+# the results are cached on the FeatureSet and shared between charts.
+
+PiCycle = namedtuple("PiCycle", ["fast", "slow", "highlight"])
+NUPL = namedtuple("NUPL", ["realized_value", "nupl", "z_score"])
+MonthlyReturns = namedtuple("MonthlyReturns", ["years", "months", "returns"])
+MonthlyReturnCube = namedtuple("MonthlyReturnCube", ["years", "returns"])
+SeasonalBands = namedtuple(
+    "SeasonalBands", ["days", "median", "mean", "percentiles", "bands", "years"]
+)
+Rainbow = namedtuple("Rainbow", ["start", "bands"])
+S2FModel = namedtuple("S2FModel", ["dates", "price"])
+S2FProjection = namedtuple("S2FProjection", ["dates", "price", "halvings"])
+
+# Offsets of the rainbow bands from the log-price fit, top band first
+RAINBOW_OFFSETS = (1.5, 1.0, 0.5, 0.0, -0.5, -1.0, -1.5)
+
+
+@indicator("pi_cycle")
+def pi_cycle(features, fast=111, slow=350, multiplier=2.0):
+    """Fast SMA, slow SMA times ``multiplier``, and where fast is above it."""
+    fast_ma = features["mean", "close", fast]
+    slow_ma = frozen(features["mean", "close", slow] * multiplier)
+    return PiCycle(fast_ma, slow_ma, frozen(fast_ma > slow_ma, bool))
+
+
+@indicator("z_score")
+def z_score(features, window=511):
+    """Distance of close from its rolling mean, in rolling std."""
+    close = features["close"].to_numpy()
+    mean = features["mean", "close", window]
+    return frozen((close - mean) / features["std", "close", window])
+
+
+@indicator("nupl")
+def nupl(features, window=180):
+    """Relative unrealized profit/loss against a ``window``-bar SMA.
+
+    The SMA stands in for the realized value. NUPL is in percent of close,
+    and z_score standardises it over the whole history.
+    """
+    close = features["close"].to_numpy()
+    realized_value = features["mean", "close", window]
+    value = (close - realized_value) / close * 100
+    z = (value - np.nanmean(value)) / np.nanstd(value, ddof=1)
+    return NUPL(realized_value, frozen(value), frozen(z))
+
+
+@feature("prefix_sums")
+def _prefix_sums(features, source):
+    return kernels.prefix_sums(features[source].to_numpy())
+
+
+@indicator("rolling_sharpe")
+def rolling_sharpe(features, windows, risk_free_rate=0.0, periods_per_year=365):
+    """Annualised rolling Sharpe ratios of returns, one row per window.
+
+    ``windows`` is a tuple of window lengths in bars, ``risk_free_rate`` an
+    annual rate and ``periods_per_year`` the number of bars in a year (365
+    daily bars, as crypto trades every day). All windows are read off the
+    same prefix sums of returns.
+    """
+    prefix = features["prefix_sums", "returns"]
+    return frozen(
+        kernels.rolling_sharpe(prefix, windows, risk_free_rate, periods_per_year)
+    )
+
+
+@indicator("monthly_return_matrix")
+def monthly_return_matrix(features):
+    """Monthly returns in percent as a years x months matrix."""
+    returns = features["monthly_returns"]
+    years, year_rows = np.unique(returns.index.year, return_inverse=True)
+    months, month_columns = np.unique(returns.index.month, return_inverse=True)
+    matrix = np.full((len(years), len(months)), np.nan)
+    matrix[year_rows, month_columns] = returns.to_numpy() * 100
+    return MonthlyReturns(
+        frozen(years, np.int64), frozen(months, np.int64), frozen(matrix)
+    )
+
+
+def monthly_return_cube(feature_sets):
+    """Monthly returns in percent of several symbols, stacked.
+
+    ``returns`` is a symbols x years x 12 array over the union of the
+    symbols' years, NaN where a symbol has no return for the month.
+    """
+    matrices = [monthly_return_matrix(features) for features in feature_sets]
+    years = np.unique(np.concatenate([matrix.years for matrix in matrices]))
+    cube = np.full((len(matrices), len(years), 12), np.nan)
+    for i, matrix in enumerate(matrices):
+        rows = np.searchsorted(years, matrix.years)
+        cube[i, rows[:, None], matrix.months - 1] = matrix.returns
+    return MonthlyReturnCube(frozen(years, np.int64), frozen(cube))
+
+
+@feature("cumulative_return_matrix")
+def _cumulative_return_matrix(features):
+    return seasonality.cumulative_return_matrix(features.key, features["returns"])
+
+
+@indicator("seasonal_bands")
+def seasonal_bands(features, percentiles=(10, 25, 75, 90), years=None, end_year=None):
+    """Day-of-year statistics of the cumulative return over full years.
+
+    Uses the years before ``end_year`` (the current year by default),
+    restricted to ``years`` when given. ``bands`` holds one row per entry of
+    ``percentiles``, all read off the years x 366 matrix in one
+    nanpercentile call. Day 366 is left out, as only leap years have it.
+    """
+    if end_year is None:
+        end_year = datetime.now().year
+    all_years, matrix = features["cumulative_return_matrix"]
+    selected = all_years < end_year
+    if years is not None:
+        selected &= np.isin(all_years, years)
+    rows = matrix[selected, :365]
+
+    with warnings.catch_warnings():
+        # Days no selected year has a return for stay NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        stats = np.nanpercentile(rows, (50, *percentiles), axis=0)
+        mean = np.nanmean(rows, axis=0)
+    return SeasonalBands(
+        frozen(np.arange(1, 366), np.int64),
+        frozen(stats[0]),
+        frozen(mean),
+        tuple(percentiles),
+        frozen(stats[1:]),
+        frozen(all_years[selected], np.int64),
+    )
+
+
+@indicator("ytd_return")
+def ytd_return(features, year=None):
+    """Return in percent from the first close of ``year`` to the last close."""
+    if year is None:
+        year = datetime.now().year
+    close = features["close"]
+    history = close[pd.Timestamp(year=year, month=1, day=1, tz=close.index.tz) :]
+    return (history.iloc[-1] / history.iloc[0] - 1) * 100
+
+
+def rainbow_fit(symbol):
+    """The ``start`` and ``genesis`` arguments of rainbow the chart uses.
+
+    BTC is fitted from 2012, its first year of steady trading, with time
+    counted from its genesis block; other symbols over their whole history.
+    """
+    if symbol == "BTC":
+        return {"start": "2012-01-01", "genesis": issuance.GENESIS_DATE}
+    return {"start": None, "genesis": None}
+
+
+@indicator("rainbow")
+def rainbow(
+    features, start=None, offsets=RAINBOW_OFFSETS, log_time=False, genesis=None
+):
+    """Rainbow bands around a log-linear fit of close from ``start``.
+
+    Log close is fitted against the bar number, or with ``log_time`` against
+    log(days since ``genesis``), the usual rainbow formulation (genesis
+    defaults to the day before the first bar). The fit is kept as running
+    sums, so a new day updates it in O(1).
+
+    ``bands`` has one row per offset, aligned to the index from position
+    ``start`` on. Each band after the first is scaled by the fair value's
+    last value over its peak, so the bands do not stack.
+    """
+    log_close = features["log_close"]
+    index = log_close.index
+    position = 0
+    if start is not None:
+        position = index.searchsorted(pd.Timestamp(start, tz=index.tz))
+    log_prices = log_close.to_numpy()[position:]
+
+    if log_time:
+        origin = index[position] - pd.Timedelta(days=1)
+        if genesis is not None:
+            origin = pd.Timestamp(genesis, tz=index.tz)
+        days = (index[position:] - origin).days
+        x = np.log(days.to_numpy(dtype=np.float64))
+    else:
+        x = np.arange(len(log_prices), dtype=np.float64)
+    slope, intercept = regression.linear_fit(
+        (features.key, start, log_time, genesis), x, log_prices
+    )
+
+    fair_value = np.exp(intercept + slope * x)
+    scale = np.full(len(offsets), fair_value[-1] / fair_value.max())
+    scale[0] = 1.0
+    bands = fair_value * (np.exp(offsets) * scale)[:, None]
+    return Rainbow(position, frozen(bands))
+
+
+def s2f_model(symbol, data):
+    """Weekly stock-to-flow model price from a CoinMetrics frame.
+
+    Returns the weekly index and the model price, exp(-1.84) * S2F^3.36,
+    where S2F is supply over a year of issuance at the current rate. The
+    weekly series is kept per ``symbol`` and only the weeks of new rows are
+    recomputed.
+    """
+    return S2FModel(
+        *stock_to_flow.weekly_model_price(
+            symbol, data.index, data["tsupply"].to_numpy(), data["issuance"].to_numpy()
+        )
+    )
+
+
+def s2f_projection(data, halvings=2):
+    """Weekly S2F model price projected past the next ``halvings`` halvings.
+
+    Supply and issuance follow Bitcoin's schedule on from the frame's last
+    supply, for a year past the last projected halving. ``halvings`` holds
+    the estimated halving dates.
+    """
+    reference_date = data.index[-1]
+    reference_supply = data["tsupply"].iloc[-1]
+    dates = issuance.halving_dates(
+        reference_date,
+        count=halvings,
+        reference_date=reference_date,
+        reference_height=int(issuance.height_at_supply(reference_supply)),
+    )
+    until = (dates[-1] if dates else reference_date) + pd.Timedelta(days=365)
+    days, supply, flow = issuance.projected_issuance(
+        reference_date, reference_supply, until
+    )
+    s2f = stock_to_flow.daily_s2f(supply, flow)
+    weekly = pd.Series(s2f, index=days).resample("W").mean()
+    return S2FProjection(
+        weekly.index,
+        frozen(stock_to_flow.model_price(weekly.to_numpy())),
+        tuple(dates),
+    )
@@ -0,0 +1,164 @@
+import functools
+import inspect
+import threading
+
+import numpy as np
+
+from indicators.rolling import rolling_stats
+
+# Derived series shared by every chart of a symbol. Each feature is a node
+# named by a tuple, with its parameters after the feature name:
+#
+#   ("close",)                    the Close column
+#   ("returns",)                  bar-over-bar percentage change of close
+#   ("log_close",)                natural log of close
+#   ("monthly_returns",)          month-end to month-end percentage change
+#   ("mean", "returns", 180)      rolling mean of another feature
+#   ("std", "close", 511)         rolling sample std of another feature
+#
+# A feature's function pulls the features it depends on from the FeatureSet
+# it is given, so the nodes form a DAG. Each node is computed at most once per
+# symbol and data version, however many charts ask for it. The indicators in
+# indicators/compute.py are nodes too, so their results are shared as well.
+_FEATURES = {}
+
+_sets = {}
+_lock = threading.Lock()
+
+
+def feature(name):
+    """Register the function computing feature ``name``."""
+
+    def register(func):
+        _FEATURES[name] = func
+        return func
+
+    return register
+
+
+def indicator(name):
+    """Register ``func`` as feature ``name`` and return a cached caller.
+
+    The caller takes the same arguments as ``func`` and looks the result up
+    on the FeatureSet, so ``func(features, 111)`` computes once per version.
+    """
+
+    def register(func):
+        feature(name)(func)
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def cached(features, *args, **kwargs):
+            bound = signature.bind(features, *args, **kwargs)
+            bound.apply_defaults()
+            return features[(name, *list(bound.arguments.values())[1:])]
+
+        return cached
+
+    return register
+
+
+def frozen(values, dtype=np.float64):
+    """Contiguous read-only copy of ``values`` (no copy if already one)."""
+    values = np.ascontiguousarray(values, dtype=dtype)
+    values.flags.writeable = False
+    return values
+
+
+@feature("close")
+def _close(features):
+    return features.data["Close"]
+
+
+@feature("returns")
+def _returns(features):
+    return features["close"].pct_change()
+
+
+@feature("log_close")
+def _log_close(features):
+    return np.log(features["close"])
+
+
+@feature("monthly_returns")
+def _monthly_returns(features):
+    returns = features["close"].resample("M").ffill().pct_change()
+    # A zero month-end close turns the next month's change into inf
+    return returns.replace(np.inf, np.nan)
+
+
+@feature("rolling")
+def _rolling(features, source, window):
+    # Mean and std come out of one pass, so both nodes share this one. Values
+    # missing from the source (the first return) are skipped and stay NaN.
+    series = features[source]
+    valid = series.notna().to_numpy()
+    if valid.all():
+        return rolling_stats(features.key, source, series, window)
+    mean, std = np.full((2, len(series)), np.nan)
+    mean[valid], std[valid] = rolling_stats(features.key, source, series[valid], window)
+    return frozen(mean), frozen(std)
+
+
+@feature("mean")
+def _mean(features, source, window):
+    return features["rolling", source, window][0]
+
+
+@feature("std")
+def _std(features, source, window):
+    return features["rolling", source, window][1]
+
+
+class FeatureSet:
+    """Features of one symbol's frame, each computed on first use.
+
+    Index with a feature name, e.g. ``features["mean", "close", 111]``.
+    Series features are indexed like ``data``; array features are aligned to
+    ``data.index`` and read-only. Results are shared with every other caller
+    and must not be modified.
+    """
+
+    def __init__(self, key, data):
+        self.key = key
+        self.data = data
+        self._values = {}
+        self._lock = threading.RLock()
+
+    def __getitem__(self, name):
+        if not isinstance(name, tuple):
+            name = (name,)
+        with self._lock:
+            if name not in self._values:
+                kind, *params = name
+                self._values[name] = _FEATURES[kind](self, *params)
+            return self._values[name]
+
+    def compute(self, names):
+        """Dict of the features named in ``names``."""
+        return {name: self[name] for name in names}
+
+
+def _data_version(data):
+    # Frames from the frame store and providers are frozen and keep the same
+    # buffers until their history changes. A writeable frame may be edited in
+    # place, so it gets no version and its features are never shared.
+    close = data["Close"].to_numpy()
+    if close.flags.writeable or not len(close):
+        return None
+    return (len(close), close.ctypes.data, data.index[0], data.index[-1])
+
+
+def get_features(symbol, currency, data, timeframe="1d"):
+    """FeatureSet over ``data``, the symbol's OHLCV frame, shared per version."""
+    key = f"{symbol}_{currency}_{timeframe}"
+    version = _data_version(data)
+    if version is None:
+        return FeatureSet(key, data)
+    with _lock:
+        entry = _sets.get(key)
+        if entry is None or entry[0] != version:
+            # The set keeps ``data`` alive, so its buffers, and with them the
+            # version, cannot be reused by another frame while it is stored
+            entry = _sets[key] = (version, FeatureSet(key, data))
+        return entry[1]
@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+
+# Scaffolding shared by the indicators kept between renders (rolling windows,
+# seasonality, regression lines and the S2F model). Each keeps one state per
+# key, built from the arrays it last consumed, and on the next call:
+#
+#   new bars appended          folds them into the state
+#   last bar re-fetched        swaps it out of the state
+#   anything else changed      history was restated, rebuilds from scratch
+#
+# The fetch planner always re-fetches the last stored bar, so the second case
+# is the daily norm and must stay cheap. Earlier values are checked against
+# the ones consumed last time, which is free when the caller passes the same
+# frozen frame again.
+
+
+def same_prefix(old, new, n):
+    """Whether the first ``n`` values of ``old`` and ``new`` are equal.
+
+    Frozen frames hand out the same read-only buffer until their history
+    changes, which needs no comparison at all.
+    """
+    if (
+        not new.flags.writeable
+        and new.ctypes.data == old.ctypes.data
+        and new.strides == old.strides
+    ):
+        return True
+    return np.array_equal(old[:n], new[:n], equal_nan=True)
+
+
+class IncrementalState:
+    """Base for a state built from arrays aligned to a date index.
+
+    Subclasses call ``consumed`` whenever they are built or updated, and
+    implement ``update(index, *arrays)`` and ``result()``.
+    """
+
+    def consumed(self, index, *arrays):
+        self.first = index[0]
+        self.last = index[-1]
+        self.inputs = arrays
+        self.length = len(index)
+
+    def matches(self, index, *arrays):
+        """Whether ``arrays`` extend the ones consumed, up to their last bar."""
+        length = self.length
+        if len(index) < length or index[0] != self.first:
+            return False
+        if index[length - 1] != self.last:
+            return False
+        return all(
+            same_prefix(old, new, length - 1) for old, new in zip(self.inputs, arrays)
+        )
+
+
+class StateStore:
+    """Incremental states kept per key, shared by the threads of a worker.
+
+    Keys are tuples starting with the feature key they were computed for.
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def result(self, key, build, *inputs):
+        """Result of the state under ``key`` brought up to ``inputs``.
+
+        The stored state is updated when ``inputs`` extend what it consumed,
+        and replaced by ``build(*inputs)`` otherwise.
+        """
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None and state.matches(*inputs):
+                state.update(*inputs)
+            else:
+                state = self._states[key] = build(*inputs)
+            return state.result()
+
+    def reset(self, symbol=None):
+        """Drop stored states, optionally only those kept for ``symbol``."""
+        with self._lock:
+            for key in list(self._states):
+                if symbol is None or key[0] == symbol:
+                    del self._states[key]
@@ -0,0 +1,114 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Array kernels shared by the indicators. They work along the last axis, so
+# the same call handles one series or a stack of them. NaNs mark missing
+# values.
+#
+# Rolling windows are read off prefix sums: once the sums are built, the
+# moments of any window cost one subtraction per bar, and every window length
+# reuses the same sums.
+PrefixSums = namedtuple("PrefixSums", ["shift", "sums", "squares", "counts"])
+
+
+def prefix_sums(values):
+    """Running sums of ``values``, their squares and the number of valid values.
+
+    Each has a leading zero, so window [i, j) sums to ``sums[..., j] -
+    sums[..., i]``. Values are shifted by their mean first, which keeps the
+    squared sums small and the variances computed from them accurate.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    count = valid.sum(axis=-1, keepdims=True)
+    shift = filled.sum(axis=-1, keepdims=True) / np.maximum(count, 1)
+    centred = np.where(valid, filled - shift, 0.0)
+
+    zero = np.zeros(values.shape[:-1] + (1,))
+    return PrefixSums(
+        shift,
+        np.concatenate([zero, np.cumsum(centred, axis=-1)], axis=-1),
+        np.concatenate([zero, np.cumsum(centred**2, axis=-1)], axis=-1),
+        np.concatenate([zero, np.cumsum(valid, axis=-1)], axis=-1),
+    )
+
+
+def window_moments(prefix, window):
+    """Rolling mean and sample std over ``window`` values, from prefix sums.
+
+    Like pandas ``rolling(window)`` with the default min_periods: a bar gets
+    NaN unless all ``window`` values ending at it are valid.
+    """
+    shape = prefix.sums.shape[:-1] + (prefix.sums.shape[-1] - 1,)
+    mean = np.full(shape, np.nan)
+    std = np.full(shape, np.nan)
+    if window > shape[-1]:
+        return mean, std
+
+    sums = prefix.sums[..., window:] - prefix.sums[..., :-window]
+    squares = prefix.squares[..., window:] - prefix.squares[..., :-window]
+    full = prefix.counts[..., window:] - prefix.counts[..., :-window] == window
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = (squares - sums**2 / window) / (window - 1)
+    mean[..., window - 1 :] = np.where(full, sums / window + prefix.shift, np.nan)
+    std[..., window - 1 :] = np.where(full, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+    return mean, std
+
+
+def rolling_sharpe(prefix, windows, risk_free_rate=0.0, periods_per_year=365):
+    """Annualised rolling Sharpe ratios of returns, one row per window.
+
+    ``prefix`` holds the prefix sums of per-period returns and
+    ``risk_free_rate`` is an annual rate. The result has shape
+    ``(len(windows),) + returns.shape``.
+    """
+    excess = risk_free_rate / periods_per_year
+    ratios = []
+    for window in windows:
+        mean, std = window_moments(prefix, window)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ratios.append((mean - excess) / std * np.sqrt(periods_per_year))
+    return np.stack(ratios)
+
+
+def linear_fit(values):
+    """Least-squares line through the valid values against their bar number.
+
+    Bars are numbered from 0 at each row's first valid value, skipping
+    missing ones. Returns the slope, the intercept and the bar numbers.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    x = np.cumsum(valid, axis=-1) - 1.0
+    n = valid.sum(axis=-1)
+    xs = np.where(valid, x, 0.0)
+    ys = np.where(valid, values, 0.0)
+    sum_x, sum_y = xs.sum(axis=-1), ys.sum(axis=-1)
+    sum_xx, sum_xy = (xs * xs).sum(axis=-1), (xs * ys).sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x**2)
+        intercept = (sum_y - slope * sum_x) / n
+    return slope, intercept, x
+
+
+def crosses_above(series, level):
+    """Bars where ``series`` moves above ``level`` from at or below it.
+
+    ``level`` is a number or an array like ``series``. NaN on either bar
+    never counts as a cross.
+    """
+    level = np.broadcast_to(level, np.shape(series))
+    events = np.zeros(np.shape(series), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        events[..., 1:] = (series[..., 1:] > level[..., 1:]) & (
+            series[..., :-1] <= level[..., :-1]
+        )
+    return events
+
+
+def crosses_below(series, level):
+    """Bars where ``series`` moves below ``level`` from at or above it."""
+    return crosses_above(-np.asarray(series), -np.asarray(level))
@@ -0,0 +1,88 @@
+import numpy as np
+
+from indicators.incremental import StateStore, same_prefix
+
+# Least-squares lines kept as their sufficient statistics (n, Σx, Σy, Σx², Σxy)
+# per key. As for every state in indicators/incremental.py, new points are
+# added in O(1) each and a re-fetched last point is swapped out; any other
+# change to the points already fitted rebuilds the sums.
+_states = StateStore()
+
+
+class LinearFit:
+    """Running sums of (x, y) points and the least-squares line through them."""
+
+    def __init__(self):
+        self.n = 0
+        self.sum_x = self.sum_y = self.sum_xx = self.sum_xy = 0.0
+
+    @classmethod
+    def from_points(cls, x, y):
+        fit = cls()
+        fit.n = len(x)
+        fit.sum_x, fit.sum_y = float(x.sum()), float(y.sum())
+        fit.sum_xx, fit.sum_xy = float(x @ x), float(x @ y)
+        return fit
+
+    def add(self, x, y, sign=1):
+        self.n += sign
+        self.sum_x += sign * x
+        self.sum_y += sign * y
+        self.sum_xx += sign * x * x
+        self.sum_xy += sign * x * y
+
+    def remove(self, x, y):
+        self.add(x, y, sign=-1)
+
+    def coefficients(self):
+        """Slope and intercept of the fitted line."""
+        slope = (self.n * self.sum_xy - self.sum_x * self.sum_y) / (
+            self.n * self.sum_xx - self.sum_x**2
+        )
+        return slope, (self.sum_y - slope * self.sum_x) / self.n
+
+
+class _Entry:
+    # Points have no date index, so x itself is matched in full
+
+    def __init__(self, x, y):
+        self.fit = LinearFit.from_points(x, y)
+        self.x, self.y = x, y
+
+    def matches(self, x, y):
+        length = len(self.x)
+        return (
+            length > 0
+            and len(x) >= length
+            and same_prefix(self.x, x, length)
+            and same_prefix(self.y, y, length - 1)
+        )
+
+    def update(self, x, y):
+        last = len(self.x) - 1
+        if y[last] != self.y[last]:
+            self.fit.remove(self.x[last], self.y[last])
+            self.fit.add(x[last], y[last])
+        for i in range(last + 1, len(x)):
+            self.fit.add(x[i], y[i])
+        self.x, self.y = x, y
+
+    def result(self):
+        return self.fit.coefficients()
+
+
+def linear_fit(key, x, y):
+    """Slope and intercept of the least-squares line through ``x``, ``y``.
+
+    Same line as ``np.polyfit(x, y, 1)``. The sums are kept under ``key``:
+    when the points are the previous ones plus new points, only the new
+    points are added.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    return _states.result(key, _Entry, x, y)
+
+
+def reset(symbol=None):
+    """Drop stored fits, optionally only those keyed by (``symbol``, ...)."""
+    _states.reset(symbol)
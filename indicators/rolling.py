@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+from indicators.incremental import IncrementalState, StateStore
+
+# Rolling-window state kept per (symbol, indicator, window). A render with one
+# new daily bar updates each indicator in constant time instead of rolling
+# over the whole history again; see indicators/incremental.py for when the
+# state is updated and when it is rebuilt.
+_states = StateStore()
+
+
+class RollingWindow:
+    """Mean and sample variance of the last ``window`` values.
+
+    Keeps a ring buffer of the values in the window with their running mean
+    and sum of squared deviations (Welford), so adding, sliding or replacing
+    one value costs O(1).
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._ring = np.empty(window)
+        self._pos = 0
+
+    @classmethod
+    def from_values(cls, values, window):
+        """State after pushing ``values``, built from its last ``window`` values."""
+        state = cls(window)
+        tail = np.asarray(values[-window:], dtype=np.float64)
+        state.count = len(tail)
+        if state.count:
+            state.mean = float(tail.mean())
+            state._m2 = float(((tail - state.mean) ** 2).sum())
+            state._ring[: state.count] = tail
+            state._pos = state.count % window
+        return state
+
+    def values(self):
+        """The values in the window, oldest first."""
+        if self.count < self.window:
+            return self._ring[: self.count]
+        return np.roll(self._ring, -self._pos)
+
+    def push(self, x):
+        if self.count < self.window:
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (x - self.mean)
+        else:
+            self._swap(self._ring[self._pos], x)
+        self._ring[self._pos] = x
+        self._pos = (self._pos + 1) % self.window
+
+    def replace_last(self, x):
+        last = (self._pos - 1) % self.window
+        self._swap(self._ring[last], x)
+        self._ring[last] = x
+
+    def _swap(self, old, new):
+        # Remove ``old`` and add ``new`` without changing the count
+        mean = self.mean + (new - old) / self.count
+        self._m2 += (new - old) * (new - mean + old - self.mean)
+        self.mean = mean
+
+    def std(self):
+        if self.count < max(self.window, 2):
+            return np.nan
+        return np.sqrt(max(self._m2, 0.0) / (self.count - 1))
+
+
+class _Indicator(IncrementalState):
+    # Window state plus the indicator history it has produced. Output arrays
+    # grow in place, so views handed out earlier are never overwritten, and
+    # are replaced by new arrays whenever an existing value changes.
+
+    def __init__(self, index, values, window):
+        rolling = pd.Series(values).rolling(window=window)
+        self.window = window
+        self.state = RollingWindow.from_values(values, window)
+        self.consumed(index, values)
+        self._mean = rolling.mean().to_numpy(dtype=np.float64)
+        self._std = rolling.std().to_numpy(dtype=np.float64)
+
+    def update(self, index, values):
+        length = self.length
+        (consumed,) = self.inputs
+        if values[length - 1] != consumed[length - 1]:
+            self.state.replace_last(values[length - 1])
+            self._mean = self._mean[:length].copy()
+            self._std = self._std[:length].copy()
+            self._set(length - 1)
+
+        if len(values) > length:
+            self._grow(len(values))
+            for i in range(length, len(values)):
+                self.state.push(values[i])
+                self._set(i)
+        self.consumed(index, values)
+
+    def _set(self, i):
+        if self.state.count < self.window:
+            self._mean[i] = self._std[i] = np.nan
+        else:
+            self._mean[i] = self.state.mean
+            self._std[i] = self.state.std()
+
+    def _grow(self, size):
+        if size <= len(self._mean):
+            return
+        capacity = max(size, 2 * len(self._mean))
+        for name in ("_mean", "_std"):
+            grown = np.empty(capacity)
+            grown[: self.length] = getattr(self, name)[: self.length]
+            setattr(self, name, grown)
+
+    def result(self):
+        mean = self._mean[: self.length]
+        std = self._std[: self.length]
+        mean.flags.writeable = False
+        std.flags.writeable = False
+        return mean, std
+
+
+def rolling_stats(symbol, indicator, series, window):
+    """Rolling mean and sample std of ``series`` over ``window`` values.
+
+    Same values as ``series.rolling(window).mean()`` and ``.std()``, returned
+    as read-only float64 arrays aligned to ``series.index``. State is kept
+    under (symbol, indicator, window): when ``series`` is the previous one
+    plus new bars, only the new bars are processed. ``series`` must not
+    contain NaNs.
+    """
+    index = series.index
+    values = series.to_numpy(dtype=np.float64)
+    if not len(values):
+        return values, values.copy()
+    return _states.result(
+        (symbol, indicator, window),
+        lambda index, values: _Indicator(index, values, window),
+        index,
+        values,
+    )
+
+
+def reset(symbol=None):
+    """Drop indicator state, optionally only that kept for ``symbol``."""
+    _states.reset(symbol)
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from indicators.incremental import IncrementalState, StateStore
+
+# Cumulative daily returns per symbol as a dense years x 366 matrix: one row
+# per calendar year, one column per day of the year, NaN where there is no
+# bar. Seasonal statistics are then column reductions over a choice of rows.
+#
+# A new day only changes the row of its own year, so the stored matrix is
+# updated in place instead of being regrouped from the whole history. As for
+# every state in indicators/incremental.py, anything but new days or a
+# re-fetched last day counts as a restatement and rebuilds the matrix.
+_states = StateStore()
+
+
+class _SeasonalMatrix(IncrementalState):
+    def __init__(self, index, values):
+        self.years = np.arange(index[0].year, index[-1].year + 1)
+        self.matrix = np.full((len(self.years), 366), np.nan)
+        self._fill_from(index, values, 0)
+        self.consumed(index, values)
+
+    def update(self, index, values):
+        self._fill_from(index, values, self.length - 1)
+        self.consumed(index, values)
+
+    def _fill_from(self, index, values, position):
+        # Rebuild the rows of every year from the one holding ``position``
+        year = index[position].year
+        start = index.searchsorted(pd.Timestamp(year=year, month=1, day=1, tz=index.tz))
+        index, values = index[start:], values[start:]
+
+        last_year = index[-1].year
+        if last_year > self.years[-1]:
+            new_years = np.arange(self.years[-1] + 1, last_year + 1)
+            self.years = np.concatenate([self.years, new_years])
+            self.matrix = np.vstack(
+                [self.matrix, np.full((len(new_years), 366), np.nan)]
+            )
+
+        first_row = year - self.years[0]
+        rows = np.full((len(self.years) - first_row, 366), np.nan)
+        rows[index.year - year, index.dayofyear - 1] = values
+        cumulative = np.nancumsum(rows, axis=1)
+        cumulative[np.isnan(rows)] = np.nan
+        self.matrix[first_row:] = cumulative
+
+    def result(self):
+        matrix = self.matrix.copy()
+        matrix.flags.writeable = False
+        return self.years.copy(), matrix
+
+
+def cumulative_return_matrix(symbol, returns):
+    """Years and the years x 366 matrix of cumulative ``returns`` by day of year.
+
+    Each row sums one calendar year's daily returns from January 1st, like
+    ``returns.groupby(year).cumsum()``; column ``d - 1`` holds day of year
+    ``d``. State is kept per ``symbol``, so a series that only adds days
+    updates the rows of their years. The returned matrix is a read-only
+    snapshot.
+    """
+    index = returns.index
+    values = returns.to_numpy(dtype=np.float64)
+    if not len(values):
+        return np.empty(0, np.int64), np.empty((0, 366))
+    return _states.result((symbol,), _SeasonalMatrix, index, values)
+
+
+def reset(symbol=None):
+    """Drop stored matrices, optionally only the one kept for ``symbol``."""
+    _states.reset(symbol)
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from indicators.incremental import IncrementalState, StateStore
+
+# Weekly stock-to-flow model price per symbol, kept between renders. The
+# daily S2F ratio is summed into one bin per week (weeks end on Sunday, like
+# resample("W")), so new CoinMetrics rows only touch the bins of their own
+# weeks. As in indicators/seasonality.py, anything but new days or a
+# re-fetched last day counts as a restatement and rebuilds the bins.
+_states = StateStore()
+
+_DAY_NS = 86_400_000_000_000
+# 1970-01-05, the first Monday after the epoch
+_FIRST_MONDAY = 4
+
+
+def _weeks(index):
+    # Week number of each date, counted in Monday-to-Sunday weeks
+    return (index.asi8 // _DAY_NS - _FIRST_MONDAY) // 7
+
+
+def model_price(s2f):
+    """Model price of the stock-to-flow ratio, exp(-1.84) * S2F^3.36."""
+    return np.exp(-1.84) * s2f**3.36
+
+
+def daily_s2f(supply, issuance):
+    """Supply over a year of issuance at each day's rate."""
+    return supply / (issuance * 365)
+
+
+class _WeeklyModel(IncrementalState):
+    def __init__(self, index, supply, issuance):
+        self.first_week = _weeks(index[:1])[0]
+        self.sums = np.zeros(0)
+        self.counts = np.zeros(0)
+        self.price = np.zeros(0)
+        self._fill_from(index, supply, issuance, 0)
+        self.consumed(index, supply, issuance)
+        self.tz = index.tz
+
+    def update(self, index, supply, issuance):
+        self._fill_from(index, supply, issuance, self.length - 1)
+        self.consumed(index, supply, issuance)
+
+    def _fill_from(self, index, supply, issuance, position):
+        # Rebuild the bins of every week from the one holding ``position``
+        weeks = _weeks(index)
+        start = np.searchsorted(weeks, weeks[position])
+        bins = weeks[start:] - self.first_week
+        first_bin = bins[0]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            s2f = daily_s2f(supply[start:], issuance[start:])
+        valid = ~np.isnan(s2f)
+        length = bins[-1] + 1
+        sums = np.bincount(bins[valid], s2f[valid], minlength=length)
+        counts = np.bincount(bins[valid], minlength=length)
+
+        self.sums = np.concatenate([self.sums[:first_bin], sums[first_bin:]])
+        self.counts = np.concatenate([self.counts[:first_bin], counts[first_bin:]])
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            mean = self.sums[first_bin:] / self.counts[first_bin:]
+            self.price = np.concatenate([self.price[:first_bin], model_price(mean)])
+
+    def result(self):
+        # Weeks are labelled with their Sunday, like resample("W")
+        days = (self.first_week + np.arange(len(self.price))) * 7 + _FIRST_MONDAY + 6
+        dates = pd.DatetimeIndex(days * _DAY_NS, tz=self.tz)
+        price = self.price.copy()
+        price.flags.writeable = False
+        return dates, price
+
+
+def weekly_model_price(symbol, index, supply, issuance):
+    """Weekly dates and S2F model price from daily ``supply`` and ``issuance``.
+
+    The model price of each week is taken at its mean daily S2F ratio, as
+    ``model_price(daily_s2f(...).resample("W").mean())``. State is kept per
+    ``symbol``, so rows appended to the history only update their weeks. The
+    returned price is a read-only snapshot.
+    """
+    supply = np.asarray(supply, dtype=np.float64)
+    issuance = np.asarray(issuance, dtype=np.float64)
+    if not len(supply):
+        return pd.DatetimeIndex([], tz=index.tz), np.empty(0)
+    return _states.result((symbol,), _WeeklyModel, index, supply, issuance)
+
+
+def reset(symbol=None):
+    """Drop stored models, optionally only the one kept for ``symbol``."""
+    _states.reset(symbol)
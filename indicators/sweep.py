@@ -0,0 +1,227 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from data.providers import SYMBOLS, provider_from_spec
+from indicators import batch, kernels
+
+# Grid search over the thresholds the charts hard-code, scored against
+# history. Every parameter set turns an indicator into sell and buy signals
+# (the bar a line is crossed), and each signal is scored by the return over
+# the following days: a sell is a hit when price is lower afterwards, a buy
+# when it is higher.
+#
+# The close matrix of all symbols and its prefix sums are built once and put
+# in shared memory, which every worker maps read-only. A task is one
+# indicator window; its rolling moments are read off the shared prefix sums
+# and every threshold of that window is scored from them.
+#
+#   python -m indicators.sweep --symbols BTC ETH SOL --csv sweep.csv
+
+# Parameters of each indicator, the charts' values among them. The first
+# keys of each grid are the windows a task shares, the rest thresholds.
+GRIDS = {
+    "pi_cycle": {
+        "fast": (90, 111, 130),
+        "slow": (300, 350, 400),
+        "multiplier": (1.8, 2.0, 2.2),
+    },
+    "z_score": {
+        "window": (365, 511, 730),
+        "upper": (4.0, 5.0, 6.0, 7.0),
+        "lower": (-1.0, -1.35, -1.7),
+    },
+    "nupl": {
+        "window": (120, 180, 240),
+        "upper": (1.5, 2.0, 2.5),
+        "lower": (-1.5, -2.0, -2.5),
+    },
+    "rainbow": {"spacing": (0.4, 0.5, 0.6)},
+}
+WINDOW_PARAMS = {
+    "pi_cycle": ("fast", "slow"),
+    "z_score": ("window",),
+    "nupl": ("window",),
+    "rainbow": (),
+}
+HORIZONS = (30, 90, 180)
+
+# Arrays mapped from shared memory in each worker
+_shared = {}
+_segments = []
+
+
+def forward_returns(close, horizon):
+    """Return over the next ``horizon`` bars, NaN where history ends."""
+    returns = np.full(close.shape, np.nan)
+    returns[..., :-horizon] = close[..., horizon:] / close[..., :-horizon] - 1
+    return returns
+
+
+def _signals(indicator, windows, thresholds):
+    # Yields (thresholds, side, events) for every threshold set of a window
+    close, prefix = _shared["close"], _shared["prefix"]
+    if indicator == "pi_cycle":
+        pi = batch.pi_cycle(close, windows["fast"], windows["slow"], 1.0, prefix)
+        for params in thresholds:
+            slow = pi.slow * params["multiplier"]
+            yield params, "sell", kernels.crosses_above(pi.fast, slow)
+    elif indicator in ("z_score", "nupl"):
+        if indicator == "z_score":
+            z = batch.z_score(close, windows["window"], prefix)
+        else:
+            z = batch.nupl(close, windows["window"], prefix).z_score
+        for params in thresholds:
+            yield params, "sell", kernels.crosses_above(z, params["upper"])
+            yield params, "buy", kernels.crosses_below(z, params["lower"])
+    elif indicator == "rainbow":
+        # Fair value, and fair value times the lower bands' scale
+        fair, scaled = batch.rainbow(close, (0.0, 0.0)).bands.transpose(1, 0, 2)
+        for params in thresholds:
+            top = fair * np.exp(3 * params["spacing"])
+            bottom = scaled * np.exp(-3 * params["spacing"])
+            yield params, "sell", kernels.crosses_above(close, top)
+            yield params, "buy", kernels.crosses_below(close, bottom)
+    else:
+        raise ValueError(f"Unknown indicator {indicator!r}")
+
+
+def _evaluate(task):
+    indicator, windows, thresholds, horizons = task
+    forward = {
+        horizon: forward_returns(_shared["close"], horizon) for horizon in horizons
+    }
+    rows = []
+    for params, side, events in _signals(indicator, windows, thresholds):
+        label = " ".join(f"{k}={v}" for k, v in {**windows, **params}.items())
+        for row, symbol in enumerate(_shared["symbols"]):
+            result = {
+                "indicator": indicator,
+                "params": label,
+                "symbol": symbol,
+                "side": side,
+                "signals": int(events[row].sum()),
+            }
+            for horizon, returns in forward.items():
+                outcome = returns[row, events[row]]
+                outcome = outcome[~np.isnan(outcome)]
+                hits = outcome < 0 if side == "sell" else outcome > 0
+                result[f"hit_rate_{horizon}"] = hits.mean() if len(hits) else np.nan
+                result[f"return_{horizon}"] = outcome.mean() if len(hits) else np.nan
+            rows.append(result)
+    return rows
+
+
+def tasks(grids=GRIDS, horizons=HORIZONS):
+    """One task per indicator window, holding every threshold set for it."""
+    for indicator, grid in grids.items():
+        window_names = WINDOW_PARAMS[indicator]
+        combos = [
+            dict(zip(grid, values)) for values in itertools.product(*grid.values())
+        ]
+        by_window = {}
+        for combo in combos:
+            key = tuple(combo[name] for name in window_names)
+            params = {k: v for k, v in combo.items() if k not in window_names}
+            by_window.setdefault(key, []).append(params)
+        for key, thresholds in by_window.items():
+            yield indicator, dict(zip(window_names, key)), thresholds, horizons
+
+
+def _share(arrays):
+    # Copies ``arrays`` into shared memory; returns the segments and the
+    # (name, shape, dtype) needed to map each one
+    segments, specs = [], {}
+    for key, array in arrays.items():
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+        segments.append(segment)
+        specs[key] = (segment.name, array.shape, array.dtype.str)
+    return segments, specs
+
+
+def _attach(symbols, specs):
+    # Pool initializer: map the shared arrays read-only
+    arrays = {}
+    for key, (name, shape, dtype) in specs.items():
+        segment = shared_memory.SharedMemory(name=name)
+        _segments.append(segment)
+        array = np.ndarray(shape, np.dtype(dtype), buffer=segment.buf)
+        array.flags.writeable = False
+        arrays[key] = array
+    _use(symbols, arrays)
+
+
+def _use(symbols, arrays):
+    _shared.update(
+        symbols=symbols,
+        close=arrays["close"],
+        prefix=kernels.PrefixSums(
+            arrays["shift"], arrays["sums"], arrays["squares"], arrays["counts"]
+        ),
+    )
+
+
+def run_sweep(matrix, grids=GRIDS, horizons=HORIZONS, workers=None):
+    """Score every parameter set of ``grids`` on ``matrix``, a CloseMatrix.
+
+    Returns a table with one row per parameter set, symbol and side: the
+    number of signals, and for each horizon in bars the share of signals
+    that were hits and their mean forward return.
+    """
+    prefix = kernels.prefix_sums(matrix.close)
+    arrays = {"close": np.asarray(matrix.close), **prefix._asdict()}
+    work = list(tasks(grids, horizons))
+    if workers == 1:
+        _use(matrix.symbols, arrays)
+        results = list(map(_evaluate, work))
+    else:
+        segments, specs = _share(arrays)
+        try:
+            pool = ProcessPoolExecutor(
+                workers, initializer=_attach, initargs=(matrix.symbols, specs)
+            )
+            with pool:
+                results = list(pool.map(_evaluate, work))
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+    return pd.DataFrame([row for rows in results for row in rows])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Score indicator parameter grids against history."
+    )
+    parser.add_argument("--symbols", nargs="+", default=list(SYMBOLS))
+    parser.add_argument("--currency", default="USD")
+    parser.add_argument(
+        "--indicators", nargs="+", choices=list(GRIDS), default=list(GRIDS)
+    )
+    parser.add_argument("--horizons", nargs="+", type=int, default=list(HORIZONS))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--provider", default=os.environ.get("VALATILITY_DATA_PROVIDER", "live")
+    )
+    parser.add_argument("--csv", help="also write the table to this file")
+    args = parser.parse_args(argv)
+
+    matrix = batch.load_close_matrix(
+        args.symbols, args.currency, provider_from_spec(args.provider)
+    )
+    grids = {name: GRIDS[name] for name in args.indicators}
+    table = run_sweep(matrix, grids, tuple(args.horizons), args.workers)
+    if args.csv:
+        table.to_csv(args.csv, index=False)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(table.to_string(index=False, float_format="%.3f"))
+
+
+if __name__ == "__main__":
+    main()
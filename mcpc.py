@@ -1,64 +1,78 @@
 import plotly.graph_objs as go
-from data.get_historical_data import (
-    get_historical_data,
-    get_coinmetrics_data,
-)  # feel free to comment this back in and comment the one below out
+from data.providers import get_provider
+from data.issuance import halving_cycle_years
+from indicators.compute import seasonal_bands, ytd_return
+from indicators.features import get_features
 from datetime import datetime
-import pandas as pd
 
+# Fill of each percentile band, outermost first
+BAND_COLORS = ["rgba(255, 165, 0, 0.12)", "rgba(255, 165, 0, 0.25)"]
 
-def get_mcpc_plot(symbol, currency):
-    # Get historical data
-    data = get_historical_data(symbol, currency)
-
-    # Calculate daily percentage change
-    data["Percentage Change"] = data["Close"].pct_change()
 
-    # Group data by year
-    data["Year"] = data.index.year
-
-    # Filter data for years from 2010 to the previous year
-    current_year = datetime.now().year
-    full_years_data = data[data["Year"] < current_year]
+def get_mcpc_plot(
+    symbol, currency, provider=None, percentiles=(10, 25, 75, 90), cycle_phase=None
+):
+    # Get historical data
+    data = get_provider(provider).get_historical_data(symbol, currency)
 
-    # Calculate cumulative sum of percentage change for each year
-    yearly_cumulative_percentage_change = full_years_data.groupby("Year")[
-        "Percentage Change"
-    ].cumsum()
+    features = get_features(symbol, currency, data)
 
-    # Calculate median cumulative percentage change for each day of the year
-    median_cumulative_percentage_change = yearly_cumulative_percentage_change.groupby(
-        full_years_data.index.dayofyear
-    ).median()
+    # Only use the years ``cycle_phase`` years after a halving, if given
+    years = None
+    if cycle_phase is not None:
+        years = halving_cycle_years(cycle_phase, datetime.now().year - 1)
 
-    # Remove the 366th day if present
-    if 366 in median_cumulative_percentage_change.index:
-        median_cumulative_percentage_change = median_cumulative_percentage_change.drop(
-            index=366
-        )
+    # Median, mean and percentile bands of the cumulative percentage change
+    # for each day of the year, over the full years to the previous year
+    seasonal = seasonal_bands(features, tuple(percentiles), years)
 
     # Get today's date
     today = datetime.now().date()
-    # Get the current year
-    current_year = datetime.now().year
-
-    # Define the start of the current year
-    start_of_year = pd.Timestamp(year=current_year, month=1, day=1, tz="UTC")
 
-    # Filter the DataFrame to only include data from the start of the current year to now
-    data_history = data[start_of_year:]
-    # display(data_history)
     # Calculate year-to-date return
-    year_start_price = data_history.iloc[0]["Close"]
-    current_price = data_history.iloc[-1]["Close"]
-    btc_ytd_return = ((current_price / year_start_price) - 1) * 100
+    btc_ytd_return = ytd_return(features)
 
     # Plot the median cumulative percentage change and add a horizontal line for YTD return
     fig = go.Figure()
+
+    # Percentile bands, pairing the lowest with the highest percentile
+    count = len(seasonal.percentiles)
+    for i in range(count // 2):
+        low, high = seasonal.percentiles[i], seasonal.percentiles[count - 1 - i]
+        fig.add_trace(
+            go.Scatter(
+                x=seasonal.days,
+                y=seasonal.bands[i] * 100,
+                mode="lines",
+                line=dict(width=0),
+                showlegend=False,
+                hoverinfo="skip",
+            )
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=seasonal.days,
+                y=seasonal.bands[count - 1 - i] * 100,
+                mode="lines",
+                line=dict(width=0),
+                fill="tonexty",
+                fillcolor=BAND_COLORS[min(i, len(BAND_COLORS) - 1)],
+                name=f"{low}th-{high}th Percentile",
+            )
+        )
     fig.add_trace(
         go.Scatter(
-            x=median_cumulative_percentage_change.index,
-            y=median_cumulative_percentage_change.values * 100,
+            x=seasonal.days,
+            y=seasonal.mean * 100,
+            mode="lines",
+            name="Mean Cumulative Percentage Change",
+            line=dict(color="white", width=1, dash="dot"),
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=seasonal.days,
+            y=seasonal.median * 100,
             mode="lines",
             name="Median Cumulative Percentage Change",
             line=dict(color="orange", width=2),
@@ -78,17 +92,20 @@ def get_mcpc_plot(symbol, currency):
 
     fig.add_shape(
         type="line",
-        x0=median_cumulative_percentage_change.index.min(),
+        x0=seasonal.days.min(),
         y0=btc_ytd_return,
-        x1=median_cumulative_percentage_change.index.max(),
+        x1=seasonal.days.max(),
         y1=btc_ytd_return,
         line=dict(color="white", width=1.5, dash="dash"),
     )
 
+    # Halving-cycle year 0 is the halving year itself
+    period = "2010 to Previous Year"
+    if cycle_phase is not None:
+        period = f"Halving-Cycle Year {cycle_phase}"
+
     fig.update_layout(
-        title="Median Cumulative % change of "
-        + symbol
-        + "$ 1D (2010 to Previous Year)",
+        title="Median Cumulative % change of " + symbol + f"$ 1D ({period})",
         title_x=0.5,
         xaxis_title="Day of the Year",
         yaxis_title="Median Cumulative Percentage Change",
@@ -4,44 +4,17 @@ import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
-from data.get_historical_data import get_historical_data
+from data.providers import get_provider
+from indicators.compute import nupl
+from indicators.features import get_features
 
 
-# Calculate Realized Value (Simple Moving Average)
-def calculate_realized_value(Closes, window=180):
-    return Closes.rolling(window=window).mean()
-
-
-# Calculate Unrealized Profit/Loss (UPL)
-def calculate_upl(Closes, realized_value):
-    return Closes - realized_value
-
-
-# Calculate NUPL indicator
-def calculate_nupl(upl, Closes):
-    return (upl / Closes) * 100  # Multiply by 100 to represent as percentage
-
-
-# Calculate Z-score
-def calculate_z_score(data):
-    return (data - data.mean()) / data.std()
-
-
-def get_nupl_score_plot(symbol, currency):
+def get_nupl_score_plot(symbol, currency, provider=None):
     # Fetch historical market data for Bitcoin
-    data = get_historical_data(symbol, currency)
-
-    # Calculate Realized Value (Simple Moving Average)
-    data["Realized_Value"] = calculate_realized_value(data["Close"])
-
-    # Calculate Unrealized Profit/Loss (UPL)
-    data["UPL"] = calculate_upl(data["Close"], data["Realized_Value"])
-
-    # Calculate NUPL indicator
-    data["NUPL"] = calculate_nupl(data["UPL"], data["Close"])
+    data = get_provider(provider).get_historical_data(symbol, currency)
 
-    # Calculate Z-score for NUPL
-    data["NUPL_Z_Score"] = calculate_z_score(data["NUPL"])
+    # NUPL against a 180-day realized value (SMA), z-scored
+    score = nupl(get_features(symbol, currency, data), 180)
 
     # Create subplots with shared x-axis
     fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -50,7 +23,7 @@ def get_nupl_score_plot(symbol, currency):
     fig.add_trace(
         go.Scatter(
             x=data.index,
-            y=data["NUPL_Z_Score"],
+            y=score.z_score,
             mode="lines",
             name="NUPL (Z-Score)",
             line=dict(color="white"),
@@ -1,21 +1,19 @@
 import numpy as np
 import plotly.graph_objs as go
 
-from data.get_historical_data import get_historical_data
+from data.providers import get_provider
+from indicators.compute import pi_cycle
+from indicators.features import get_features
 
 
-def get_pi_top_plot(symbol, currency):
-    data = get_historical_data(symbol, currency)
+def get_pi_top_plot(symbol, currency, provider=None, timeframe="1d"):
+    data = get_provider(provider).get_historical_data(symbol, currency, timeframe)
 
-    # Calculate moving averages
-    data["111DMA"] = data["Close"].rolling(window=111).mean()
-    data["350DMA*2"] = data["Close"].rolling(window=350).mean() * 2
+    # Moving averages, and where 111DMA > 350DMA * 2
+    pi = pi_cycle(get_features(symbol, currency, data, timeframe), 111, 350)
 
-    # Calculate Pi Cycle Top Indicator
-    data["PiTop"] = data[["111DMA", "350DMA*2"]].max(axis=1)
-
-    # Find where 111DMA > 350DMA * 2
-    data["Highlight"] = data["111DMA"] > data["350DMA*2"]
+    # Windows count bars, so they are days only on the daily timeframe
+    period = "day" if timeframe == "1d" else timeframe
 
     # Create an interactive plotly graph
     fig = go.Figure()
@@ -35,28 +33,25 @@ def get_pi_top_plot(symbol, currency):
     fig.add_trace(
         go.Scatter(
             x=data.index,
-            y=data["111DMA"],
+            y=pi.fast,
             mode="lines",
-            name="111-day Moving Average",
+            name=f"111-{period} Moving Average",
             line=dict(color="#FF97FF"),
         )
     )
     fig.add_trace(
         go.Scatter(
             x=data.index,
-            y=data["350DMA*2"],
+            y=pi.slow,
             mode="lines",
-            name="350-day Moving Average x2",
+            name=f"350-{period} Moving Average x2",
             line=dict(color="CYAN"),
         )
     )
 
-    # Add Pi Cycle Top Indicator
-    # fig.add_trace(go.Scatter(x=data.index, y=data['PiTop'], mode='lines', name='Pi Cycle Top Indicator', line=dict(color='red')))
-
     # Highlight areas where 111DMA > 350DMA * 2
-    highlighted_dates = data[data["Highlight"]].index
-    highlighted_prices = data[data["Highlight"]]["Close"]
+    highlighted_dates = data.index[pi.highlight]
+    highlighted_prices = data["Close"].to_numpy()[pi.highlight]
     fig.add_trace(
         go.Scatter(
             x=highlighted_dates,
@@ -69,7 +64,7 @@ def get_pi_top_plot(symbol, currency):
 
     # Set layout with black background
     fig.update_layout(
-        title=symbol + "$ 1D with Moving Averages and Pi Cycle Top Indicator",
+        title=f"{symbol}$ {timeframe.upper()} with Moving Averages and Pi Cycle Top Indicator",
         title_x=0.5,
         xaxis=dict(title="Date"),
         yaxis=dict(title="Price", type="log"),
@@ -0,0 +1,53 @@
+from collections import OrderedDict
+
+from plotly_resampler import FigureResampler
+from plotly_resampler.aggregation import MinMaxLTTB
+
+from figure_cache import load_figure, load_traces
+
+# Long line charts are sent to the browser downsampled. A FigureResampler
+# keeps each trace at full resolution on the server and sends
+# SHOWN_SAMPLES points of it, picked with MinMaxLTTB so peaks and troughs
+# survive. Zooming in asks for the visible range again at the same number
+# of points, so detail comes back as the range narrows.
+#
+# SHOWN_SAMPLES is about the width of a chart in pixels; more points than
+# that cannot be told apart on screen.
+#
+# For zooming, a cached figure's resampler is rebuilt from its JSON and the
+# full resolution traces stored beside it. Each process keeps the last
+# RESAMPLER_CACHE_SIZE it rebuilt, as one user zooming around a chart asks
+# for the same one again and again.
+SHOWN_SAMPLES = 1000
+RESAMPLER_CACHE_SIZE = 8
+
+_resamplers = OrderedDict()
+
+
+def resample(figure, n_shown_samples=SHOWN_SAMPLES):
+    """``figure`` as a FigureResampler showing ``n_shown_samples`` per trace."""
+    return FigureResampler(
+        figure,
+        default_n_shown_samples=n_shown_samples,
+        default_downsampler=MinMaxLTTB(),
+        # Keep the charts' own legend names
+        resampled_trace_prefix_suffix=("", ""),
+        show_mean_aggregation_size=False,
+    )
+
+
+def load_resampler(key):
+    """Resampler of the cached figure ``key``, or None if it is not cached."""
+    resampler = _resamplers.get(key)
+    if resampler is not None:
+        _resamplers.move_to_end(key)
+        return resampler
+    figure, traces = load_figure(key), load_traces(key)
+    if figure is None or traces is None:
+        return None
+    for i, (x, y) in traces.items():
+        figure["data"][i].update(x=x, y=y)
+    resampler = _resamplers[key] = resample(figure)
+    if len(_resamplers) > RESAMPLER_CACHE_SIZE:
+        _resamplers.popitem(last=False)
+    return resampler
@@ -1,41 +1,31 @@
-import numpy as np
+import pandas as pd
 import plotly.graph_objs as go
 
-from data.get_historical_data import (  # feel free to comment this back in and comment the one below out
-    get_coinmetrics_data,
-    get_historical_data,
-)
+from data.providers import get_provider
+from indicators.compute import s2f_model, s2f_projection
 
 
-def get_s2f_plot(symbol, currency):
-    # function to calculate fair-value of bitcoin using S2F model
-    def calculate_expression(SF):
-        result = np.exp(-1.84) * (SF**3.36)
-        return result
+def get_s2f_plot(symbol, currency, provider=None, halvings=2):
+    provider = get_provider(provider)
+    data = provider.get_coinmetrics_data(symbol)
 
-    data = get_coinmetrics_data(symbol)
+    # Weekly fair-value of bitcoin using the S2F model
+    model_dates, model_price = s2f_model(symbol, data)
 
-    data["lnMC"] = np.log(data["CapMrktCurUSD"])
-    data["lndiff"] = np.log(data["DiffMean"])
-    data["issuance_avg"] = data["issuance"].resample("W").mean(numeric_only=True)
-    data["fwd_issuance"] = data["issuance"] * 365
-    data["s2f"] = data["tsupply"] / data["fwd_issuance"]
-    data["lns2f"] = np.log(data["s2f"])
-    data = data.resample("W").mean(numeric_only=True)
-
-    # apply function to s2f to get BTC fair-value
-    data["Model BTC Price"] = calculate_expression(data["s2f"])
-
-    # Get all-time historical data from CryptoCompare API
-    hdata = get_historical_data(symbol, currency)
+    # CoinMetrics already carries the USD price, so the price line needs no
+    # second history load
+    if currency == "USD":
+        price = pd.to_numeric(data["PriceUSD"], errors="coerce")
+    else:
+        price = provider.get_historical_data(symbol, currency)["Close"]
     # Create an interactive plotly graph
     fig = go.Figure()
 
     # Add Bitcoin closing prices
     fig.add_trace(
         go.Scatter(
-            x=hdata.index,
-            y=hdata["Close"],
+            x=price.index,
+            y=price,
             mode="lines",
             name=symbol + " Close Price",
             line=dict(color="orange"),
@@ -45,14 +35,29 @@ def get_s2f_plot(symbol, currency):
     # Add s2f model
     fig.add_trace(
         go.Scatter(
-            x=data.index,
-            y=data["Model " + symbol + " Price"],
+            x=model_dates,
+            y=model_price,
             mode="lines",
             name="s2f model",
             line=dict(color="CYAN"),
         )
     )
 
+    # Project the model past the next halvings of Bitcoin's issuance schedule
+    if symbol == "BTC" and halvings:
+        projection = s2f_projection(data, halvings)
+        fig.add_trace(
+            go.Scatter(
+                x=projection.dates,
+                y=projection.price,
+                mode="lines",
+                name="s2f model (projected)",
+                line=dict(color="CYAN", dash="dot"),
+            )
+        )
+        for date in projection.halvings:
+            fig.add_vline(x=date, line_dash="dot", line_color="gray")
+
     # Set layout with black background
     fig.update_layout(
         title=symbol + "$ 1D vs Stock-to-Flow Modeled Price",
@@ -61,7 +66,7 @@ def get_s2f_plot(symbol, currency):
         plot_bgcolor="rgba(17, 17, 17, 1)",
         paper_bgcolor="rgba(0, 0, 0, 0)",
         font=dict(color="white"),
-        yaxis=dict(showticklabels=True, showgrid=False, title="Price", type="log")
+        yaxis=dict(showticklabels=True, showgrid=False, title="Price", type="log"),
     )
 
     fig.update_layout(legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01))
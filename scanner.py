@@ -0,0 +1,184 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import orjson
+import pandas as pd
+
+from data.providers import SYMBOLS, get_provider, provider_from_spec
+from indicators import kernels
+from indicators.compute import nupl, pi_cycle, rainbow, rainbow_fit, z_score
+from indicators.features import get_features
+
+# Headless check of the dashboard's signals. Each symbol is loaded once, its
+# indicators come from the shared feature sets (and with them the
+# incremental rolling state), and every threshold crossing on a bar after
+# the last scanned one is written as a JSON line. Only closed daily bars are
+# scanned; today's bar is still moving and is picked up once it has closed:
+#
+#   {"symbol": "BTC", "date": "2024-03-05", "indicator": "z_score",
+#    "event": "cross_above", "value": 6.2, "level": 6.0}
+#
+# The date of the last scanned bar per symbol is kept in STATE_FILE, so a
+# daily run only reports the new days. With --every the scanner keeps
+# running and rescans in process, where the indicator state updates per
+# new bar instead of being rebuilt.
+STATE_FILE = "scanner_state.json"
+
+# The lines drawn on the charts
+Z_SCORE_BANDS = (6.0, -1.35)
+NUPL_BANDS = (2.0, -2.0)
+
+
+def _crossings(indicator, values, upper, lower):
+    # (indicator, event, bars, values, level) for both lines of a band pair
+    return [
+        (indicator, "cross_above", kernels.crosses_above(values, upper), values, upper),
+        (indicator, "cross_below", kernels.crosses_below(values, lower), values, lower),
+    ]
+
+
+def rainbow_band(close, bands):
+    """Band each close sits in: 0 above the top band, len(bands) below the last."""
+    with np.errstate(invalid="ignore"):
+        return (close < bands).sum(axis=0)
+
+
+def scan_symbol(symbol, currency="USD", provider=None, since=None):
+    """Threshold crossings of ``symbol`` on bars after ``since``.
+
+    Returns the events as dicts, oldest first, and the date of the last
+    closed bar scanned. Without ``since`` only the last closed bar is scanned.
+    """
+    data = get_provider(provider).get_historical_data(symbol, currency)
+    features = get_features(symbol, currency, data)
+    index = data.index
+    today = pd.Timestamp.now(tz="UTC").floor("D")
+    closed = index.searchsorted(today if index.tz else today.tz_localize(None))
+    first = closed - 1
+    if since is not None:
+        first = index.searchsorted(pd.Timestamp(since, tz=index.tz), side="right")
+    if first >= closed or closed == 0:
+        return [], since
+
+    pi = pi_cycle(features)
+    crossed = kernels.crosses_above(pi.fast, pi.slow)
+    checks = [("pi_cycle", "cross_above", crossed, pi.fast, pi.slow)]
+    checks += _crossings("z_score", z_score(features), *Z_SCORE_BANDS)
+    checks += _crossings("nupl", nupl(features).z_score, *NUPL_BANDS)
+
+    events = []
+    for indicator, event, bars, values, level in checks:
+        for i in np.flatnonzero(bars[first:closed]) + first:
+            events.append(
+                {
+                    "symbol": symbol,
+                    "date": index[i].date().isoformat(),
+                    "indicator": indicator,
+                    "event": event,
+                    "value": float(values[i]),
+                    "level": float(np.broadcast_to(level, values.shape)[i]),
+                }
+            )
+
+    # The bands the rainbow chart draws
+    bands = rainbow(features, **rainbow_fit(symbol))
+    close = features["close"].to_numpy()[bands.start : closed]
+    band = rainbow_band(close, bands.bands[:, : len(close)])
+    start = max(first - bands.start, 1)
+    for i in np.flatnonzero(band[start:] != band[start - 1 : -1]) + start:
+        events.append(
+            {
+                "symbol": symbol,
+                "date": index[i + bands.start].date().isoformat(),
+                "indicator": "rainbow",
+                "event": "band_change",
+                "value": int(band[i]),
+                "level": int(band[i - 1]),
+            }
+        )
+
+    events.sort(key=lambda event: event["date"])
+    return events, index[closed - 1].date().isoformat()
+
+
+def load_state(path=STATE_FILE):
+    """{symbol: date of the last scanned bar}, empty before the first scan."""
+    try:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(state, path=STATE_FILE):
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps(state, option=orjson.OPT_SORT_KEYS))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def scan(symbols=SYMBOLS, currency="USD", provider=None, state=None, workers=None):
+    """Scan ``symbols`` in a thread pool; returns the events and the new state.
+
+    ``state`` maps each symbol to the last bar already scanned.
+    """
+    state = dict(state or {})
+    with ThreadPoolExecutor(workers) as pool:
+        results = pool.map(
+            lambda symbol: scan_symbol(symbol, currency, provider, state.get(symbol)),
+            symbols,
+        )
+        events = []
+        for symbol, (symbol_events, last) in zip(symbols, results):
+            events.extend(symbol_events)
+            state[symbol] = last
+    return events, state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Write the dashboard's threshold crossings as JSON lines."
+    )
+    parser.add_argument("--symbols", nargs="+", default=list(SYMBOLS))
+    parser.add_argument("--currency", default="USD")
+    parser.add_argument(
+        "--provider", default=os.environ.get("VALATILITY_DATA_PROVIDER", "live")
+    )
+    parser.add_argument("--state", default=STATE_FILE)
+    parser.add_argument(
+        "--since", help="scan every bar after this date, ignoring the saved state"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--every", type=float, help="keep running, rescanning every N seconds"
+    )
+    args = parser.parse_args(argv)
+
+    provider = provider_from_spec(args.provider)
+    state = load_state(args.state)
+    if args.since:
+        state = {symbol: args.since for symbol in args.symbols}
+    while True:
+        events, state = scan(args.symbols, args.currency, provider, state, args.workers)
+        for event in events:
+            sys.stdout.buffer.write(orjson.dumps(event) + b"\n")
+        sys.stdout.flush()
+        save_state(state, args.state)
+        if args.every is None:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,40 @@
+import warnings
+
 import numpy as np
-import pandas as pd
 import plotly.graph_objs as go
 
-from data.get_historical_data import get_historical_data
-
-
-def get_seasonality_heatmap_plot(symbol, currency):
-    # Define a dictionary to map month numbers to names
-    month_names = {
-        1: "Jan",
-        2: "Feb",
-        3: "Mar",
-        4: "Apr",
-        5: "May",
-        6: "Jun",
-        7: "Jul",
-        8: "Aug",
-        9: "Sep",
-        10: "Oct",
-        11: "Nov",
-        12: "Dec",
-    }
-    # Get all-time historical data from CryptoCompare API
+from data.providers import SYMBOLS, get_provider
+from indicators.compute import monthly_return_cube, monthly_return_matrix
+from indicators.features import get_features
 
-    data = get_historical_data(symbol, currency)
-
-    # Convert the daily prices to monthly returns
-    data_monthly_returns = data["Close"].resample("M").ffill().pct_change()
-    # Create a DataFrame that shows year and month for each row
-    data_monthly_returns_df = pd.DataFrame(data_monthly_returns)
-    data_monthly_returns_df.replace(
-        np.inf, np.nan, inplace=True
-    )  # REPLACE ONE INF VALUE SET IN THE DF (IDK WHY IT IS HERE)
-    data_monthly_returns_df["Year"] = data_monthly_returns_df.index.year
-    data_monthly_returns_df["Month"] = data_monthly_returns_df.index.month
-    data_monthly_returns_df["Returns"] = data_monthly_returns_df["Close"] * 100
-    # Pivot the DataFrame to have years as rows, months as columns, and returns as values
-    seasonality_df = data_monthly_returns_df.pivot(
-        index="Year", columns="Month", values="Returns"
-    )
+# Define a dictionary to map month numbers to names
+MONTH_NAMES = {
+    1: "Jan",
+    2: "Feb",
+    3: "Mar",
+    4: "Apr",
+    5: "May",
+    6: "Jun",
+    7: "Jul",
+    8: "Aug",
+    9: "Sep",
+    10: "Oct",
+    11: "Nov",
+    12: "Dec",
+}
 
-    # Generate hover text information
-    hover_text = []
-    for yi, yy in enumerate(seasonality_df.index):
-        hover_text.append([])
-        for xi, xx in enumerate(seasonality_df.columns):
-            hover_text[-1].append(
-                f"Year: {yy}<br>Month: {month_names[xx]}<br>Return: {seasonality_df.values[yi][xi].round(1)}%"
-            )
+
+def _cell_text(returns):
+    # "12.3%" for every cell at once, empty for gaps so they stay unlabelled
+    text = np.char.add(np.char.mod("%.1f", returns), "%")
+    return np.where(np.isnan(returns), "", text)
+
+
+def _colorscale(returns):
     # Colorscale for heatmap values
-    mid_point_value = 0 - data_monthly_returns_df["Returns"].min() / (
-        data_monthly_returns_df["Returns"].max()
-        - data_monthly_returns_df["Returns"].min()
-    )
-    colorscale = [
+    low, high = np.nanmin(returns), np.nanmax(returns)
+    mid_point_value = np.clip(0 - low / (high - low), 0.0, 0.99)
+    return [
         [0.0, "rgb(229,31,31)"],  # lower bound color
         [mid_point_value, "rgb(247,227,121)"],  # mid bound color
         [
@@ -63,38 +44,27 @@ def get_seasonality_heatmap_plot(symbol, currency):
         [1.0, "rgb(68,206,27)"],  # upper bound color
     ]
 
-    # Use Plotly to create the heat map
-    fig = go.Figure(
-        data=go.Heatmap(
-            z=seasonality_df,
-            x=[month_names[i] for i in seasonality_df.columns],
-            y=seasonality_df.index,
-            text=hover_text,  # Apply hover text
-            hoverinfo="text",  # Display the text on hover
-            hoverongaps=False,
-            colorscale=colorscale,
-        )
+
+def _heatmap(returns, x, y, hovertemplate, customdata=None):
+    # The trace labels every cell itself through texttemplate, rather than
+    # one layout annotation per cell
+    return go.Heatmap(
+        z=returns,
+        x=x,
+        y=y,
+        text=_cell_text(returns),
+        texttemplate="%{text}",
+        textfont=dict(color="black", size=12),
+        customdata=customdata,
+        hovertemplate=hovertemplate,
+        hoverongaps=False,
+        colorscale=_colorscale(returns),
     )
-    # Add annotations
-    for y, year in enumerate(seasonality_df.index):
-        for m, month in enumerate(seasonality_df.columns):
-            value = seasonality_df.iloc[y, m]
-            # Only proceed if value is not NaN
-            if not pd.isna(value):
-                fig.add_annotation(
-                    dict(
-                        font=dict(color="black"),
-                        x=month_names[month],
-                        y=year,
-                        text=f"{value.round(1)}%",
-                        showarrow=False,
-                        xanchor="center",
-                        yanchor="middle",
-                    )
-                )
 
+
+def _update_layout(fig, title):
     fig.update_layout(
-        title=symbol + "$ 1D Monthly Returns (%) Heatmap",
+        title=title,
         title_x=0.5,
         margin=dict(l=0, r=0, t=20, b=20),
         xaxis_nticks=12,
@@ -103,6 +73,59 @@ def get_seasonality_heatmap_plot(symbol, currency):
         font=dict(color="white"),
     )
     fig.update_traces(colorbar_orientation="h")
+
+
+def get_seasonality_heatmap_plot(symbol, currency, provider=None):
+    # Get all-time historical data from CryptoCompare API
+    data = get_provider(provider).get_historical_data(symbol, currency)
+
+    # Monthly returns with years as rows and months as columns
+    monthly = monthly_return_matrix(get_features(symbol, currency, data))
+
+    # Use Plotly to create the heat map
+    fig = go.Figure(
+        data=_heatmap(
+            monthly.returns,
+            [MONTH_NAMES[month] for month in monthly.months],
+            monthly.years,
+            "Year: %{y}<br>Month: %{x}<br>Return: %{text}<extra></extra>",
+        )
+    )
+    _update_layout(fig, symbol + "$ 1D Monthly Returns (%) Heatmap")
+    return fig
+
+
+def get_multi_asset_seasonality_plot(symbols=SYMBOLS, currency="USD", provider=None):
+    # Monthly returns of every symbol, stacked into one symbols x years x
+    # months array
+    provider = get_provider(provider)
+    cube = monthly_return_cube(
+        [
+            get_features(
+                symbol, currency, provider.get_historical_data(symbol, currency)
+            )
+            for symbol in symbols
+        ]
+    )
+
+    # Median return of each symbol and month across the years it traded
+    with warnings.catch_warnings():
+        # A month the symbol has no returns for yet stays NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(cube.returns, axis=1)
+    years = (~np.isnan(cube.returns)).sum(axis=1)
+
+    fig = go.Figure(
+        data=_heatmap(
+            median,
+            list(MONTH_NAMES.values()),
+            list(symbols),
+            "%{y} in %{x}<br>Median return: %{text}<br>"
+            "Years: %{customdata}<extra></extra>",
+            customdata=years,
+        )
+    )
+    _update_layout(fig, "Median Monthly Returns (%) by Asset")
     return fig
 
 
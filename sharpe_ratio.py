@@ -2,41 +2,45 @@ import requests
 import datetime
 import pandas as pd
 import plotly.graph_objects as go
-from data.get_historical_data import get_historical_data
+from data.providers import get_provider
+from data.resample import timeframe_delta
+from indicators.compute import rolling_sharpe
+from indicators.features import get_features
 
-# Function to calculate rolling Sharpe ratio
-def calculate_rolling_sharpe_ratio(data, window):
-    returns = data['Close'].pct_change().dropna()
-    rolling_mean = returns.rolling(window=window).mean()
-    rolling_std = returns.rolling(window=window).std()
-    sharpe_ratio = rolling_mean / rolling_std * (252 ** 0.5)  # Annualized Sharpe ratio
-    return sharpe_ratio
+# Windows offered on the dashboard, in days, with their labels
+SHARPE_WINDOWS = {60: '3 Months', 180: '6 Months', 360: '12 Months'}
 
-def get_sharpe_plot(symbol, currency):
+def get_sharpe_plot(symbol, currency, provider=None, timeframe="1d", window=180,
+                    risk_free_rate=0.0, days_per_year=365):
     # Get crypto historical data
-    crypto_data = get_historical_data(symbol, currency)
-    
-    # Create a DataFrame with the Date as the index
-    data_df = pd.DataFrame(crypto_data, columns=['Close'])
-    data_df['Date'] = pd.to_datetime(data_df.index, utc=True).tz_convert(None)
-    data_df.set_index('Date', inplace=True)
+    crypto_data = get_provider(provider).get_historical_data(symbol, currency, timeframe)
+
+    # Windows are given in days, so convert them to bars of this timeframe.
+    # Crypto trades every day, so a year has 365 days of bars by default.
+    bars_per_day = pd.Timedelta(days=1) / timeframe_delta(timeframe)
+    periods_per_year = days_per_year * bars_per_day
+    bars = max(int(round(window * bars_per_day)), 2)
+
+    features = get_features(symbol, currency, crypto_data, timeframe)
     
-    # Default window length
-    default_window = 180
+    # Plot against naive dates
+    dates = crypto_data.index.tz_convert(None)
     
-    # Calculate rolling Sharpe ratio with default window
-    rolling_sharpe_ratio = calculate_rolling_sharpe_ratio(data_df, default_window)
+    # Calculate rolling Sharpe ratio for the chosen window only; other
+    # windows are separate figures, picked on the dashboard
+    rolling_sharpe_ratio = rolling_sharpe(features, (bars,), risk_free_rate, periods_per_year)[0]
+    label = SHARPE_WINDOWS.get(window, f'{window} Days')
     
     # Create Plotly figure
     fig = go.Figure()
     
     # Add rolling Sharpe ratio trace
-    fig.add_trace(go.Scatter(x=rolling_sharpe_ratio.index, y=rolling_sharpe_ratio,
+    fig.add_trace(go.Scatter(x=dates, y=rolling_sharpe_ratio,
                              mode='lines',
-                             name=f'Rolling {default_window // 30}m Sharpe Ratio',
+                             name=f'Rolling {label} Sharpe Ratio',
                              line=dict(color='orange', width=2.25)))  # Set line width to 2.25
     
-    # Update layout with buttons and aesthetics similar to get_rainbow
+    # Update layout with aesthetics similar to get_rainbow
     fig.update_layout(
         title=f'{symbol} Rolling Sharpe Ratio',
         xaxis_title='Date',
@@ -44,25 +48,6 @@ def get_sharpe_plot(symbol, currency):
         plot_bgcolor='rgba(17, 17, 17, 1)',  # Black background color
         paper_bgcolor='rgba(0, 0, 0, 0)',    # Transparent paper color
         font=dict(color='white'),
-        updatemenus=[dict(
-            active=1,
-            buttons=[
-                dict(label='3 Months',
-                     method='update',
-                     args=[{'y': [calculate_rolling_sharpe_ratio(data_df, 60).values],
-                            'name': 'Rolling 3m Sharpe Ratio'}]),
-                dict(label='6 Months',
-                     method='update',
-                     args=[{'y': [calculate_rolling_sharpe_ratio(data_df, 180).values],
-                            'name': 'Rolling 6m Sharpe Ratio'}]),
-                dict(label='12 Months',
-                     method='update',
-                     args=[{'y': [calculate_rolling_sharpe_ratio(data_df, 360).values],
-                            'name': 'Rolling 12m Sharpe Ratio'}])
-            ],
-            direction="down",
-            pad={"r": 10, "t": 10}
-        )],
         xaxis=dict(showgrid=False),  # Hide vertical grid lines
         yaxis=dict(showgrid=False),  # Hide horizontal grid lines
         title_x=0.5
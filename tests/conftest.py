@@ -0,0 +1,129 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import orjson
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data import get_historical_data as historical  # noqa: E402
+
+DAY = 86400
+
+
+class StandInUpstream:
+    """Local stand-in for the CryptoCompare and CoinMetrics endpoints.
+
+    CryptoCompare serves daily bars from ``first_traded`` to today, padded
+    with zero bars back to ``oldest``, before which it has nothing. CoinMetrics
+    serves daily rows from ``metrics_start`` to yesterday, ``page_size`` at a
+    time. Every request's query is kept in ``requests``; with ``fail`` set,
+    each request is answered with that HTTP status instead.
+    """
+
+    def __init__(self):
+        self.today = pd.Timestamp.now(tz="UTC").normalize()
+        self.first_traded = self.today - pd.Timedelta(days=4500)
+        self.oldest = self.today - pd.Timedelta(days=10000)
+        self.metrics_start = pd.Timestamp("2020-01-01")
+        self.fail = None
+        self.requests = []
+
+    def bar(self, time):
+        day = int((time - self.first_traded.timestamp()) // DAY)
+        if day < 0:
+            return {
+                "time": time,
+                "open": 0,
+                "high": 0,
+                "low": 0,
+                "close": 0,
+                "volumefrom": 0,
+            }
+        close = 100.0 + day
+        return {
+            "time": time,
+            "open": close - 1,
+            "high": close + 2,
+            "low": close - 2,
+            "close": close,
+            "volumefrom": 10.0 + day,
+        }
+
+    def histoday(self, query):
+        to_ts = min(int(query["toTs"]), int(self.today.timestamp()))
+        last = to_ts - to_ts % DAY
+        times = range(last - int(query["limit"]) * DAY, last + DAY, DAY)
+        bars = [self.bar(t) for t in times if t >= self.oldest.timestamp()]
+        return {"Response": "Success", "Data": {"Data": bars}}
+
+    def metric_row(self, day):
+        n = (day - self.metrics_start).days
+        return {
+            "asset": "BTC",
+            "time": day.strftime("%Y-%m-%dT00:00:00.000000000Z"),
+            "SplyCur": str(1e7 + 900 * n),
+            "IssContNtv": "900",
+            "CapMrktCurUSD": str(1e9 + n),
+            "PriceUSD": str(100.0 + n),
+            "DiffMean": str(1e12),
+        }
+
+    def asset_metrics(self, query):
+        yesterday = self.today.tz_convert(None) - pd.Timedelta(days=1)
+        start = max(pd.Timestamp(query["start_time"]), self.metrics_start)
+        end = min(pd.Timestamp(query["end_time"]), yesterday)
+        days = pd.date_range(start, end, freq="D")
+        offset = int(query.get("next_page_token", 0))
+        size = int(query["page_size"])
+        page = {"data": [self.metric_row(day) for day in days[offset : offset + size]]}
+        if offset + size < len(days):
+            page["next_page_token"] = str(offset + size)
+        return page
+
+    def handle(self, path, query):
+        self.requests.append((path, query))
+        if path.endswith("/histoday"):
+            return self.histoday(query)
+        if path.endswith("/asset-metrics"):
+            return self.asset_metrics(query)
+        return None
+
+
+@pytest.fixture
+def upstream(monkeypatch, tmp_path):
+    """A running StandInUpstream the fetchers point at, in an empty store."""
+    stand_in = StandInUpstream()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            body = stand_in.handle(url.path, query)
+            status = stand_in.fail or (200 if body is not None else 404)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            if status == 200:
+                self.wfile.write(orjson.dumps(body))
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(historical, "CRYPTOCOMPARE_URL", base + "/data/v2/{endpoint}")
+    monkeypatch.setattr(
+        historical, "COINMETRICS_URL", base + "/v4/timeseries/asset-metrics"
+    )
+    # The history store and its Arrow mappings live under the working directory
+    monkeypatch.chdir(tmp_path)
+    yield stand_in
+    server.shutdown()
+    server.server_close()
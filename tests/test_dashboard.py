@@ -0,0 +1,221 @@
+import importlib
+import os
+import time
+from collections import OrderedDict
+
+import orjson
+import pandas as pd
+import pytest
+from plotly.io.json import to_json_plotly
+
+import figure_cache
+import resampling
+from data import frame_store, providers
+from data.providers import SyntheticProvider
+
+
+@pytest.fixture
+def dashboard(monkeypatch, tmp_path):
+    # The job and figure caches are created under the working directory
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module("dashboard")
+
+
+def request_job(dashboard, name):
+    # The job update_chart hands to the background build of an uncached chart
+    output = f"..{name}-graph.figure...{name}-job.data.."
+    callback = dashboard.app.callback_map[output]
+    inputs = [
+        {"id": f"{name}-load", "property": "n_clicks", "value": 1},
+        {"id": "crypto-selector", "property": "value", "value": "BTC"},
+        {"id": "data-refresh", "property": "data", "value": None},
+    ]
+    inputs += [
+        {"id": item["id"], "property": "value", "value": 180}
+        for item in callback["inputs"][3:]
+    ]
+    response = dashboard.app.server.test_client().post(
+        "/_dash-update-component",
+        json={
+            "output": output,
+            "outputs": [
+                {"id": f"{name}-graph", "property": "figure"},
+                {"id": f"{name}-job", "property": "data"},
+            ],
+            "inputs": inputs,
+            "changedPropIds": [f"{name}-load.n_clicks"],
+        },
+    )
+    return orjson.loads(response.data)["response"][f"{name}-job"]["data"]
+
+
+def test_chart_jobs_have_their_own_results(dashboard):
+    manager = dashboard.background_callback_manager
+    keys = {}
+    for callback in dashboard.app.callback_map.values():
+        job_input = callback["inputs"][0]["id"]
+        if not job_input.endswith("-job"):
+            continue
+        name = job_input[: -len("-job")]
+        build_chart = callback["callback"].__wrapped__
+        job = request_job(dashboard, name)
+        keys[name] = manager.build_cache_key(build_chart, [job], [])
+
+    assert sorted(keys) == sorted(dashboard.CHARTS)
+    # Jobs for the same symbol and data never share a result across charts
+    assert len(set(keys.values())) == len(keys)
+
+
+@pytest.fixture
+def synthetic(monkeypatch):
+    provider = SyntheticProvider(length=4000, seed=1)
+    monkeypatch.setattr(providers, "_default_provider", provider)
+    # Resamplers rebuilt by earlier tests belong to other directories
+    monkeypatch.setattr(resampling, "_resamplers", OrderedDict())
+    return provider
+
+
+def zoom(dashboard, name, relayout_data):
+    output = next(
+        key
+        for key, callback in dashboard.app.callback_map.items()
+        if callback["inputs"][0] == {"id": f"{name}-graph", "property": "relayoutData"}
+    )
+    state = [{"id": "crypto-selector", "property": "value", "value": "BTC"}]
+    response = dashboard.app.server.test_client().post(
+        "/_dash-update-component",
+        json={
+            "output": output,
+            "outputs": {"id": f"{name}-graph", "property": output.split(".", 1)[1]},
+            "inputs": [
+                {
+                    "id": f"{name}-graph",
+                    "property": "relayoutData",
+                    "value": relayout_data,
+                }
+            ],
+            "state": state,
+            "changedPropIds": [f"{name}-graph.relayoutData"],
+        },
+    )
+    if response.status_code == 204:
+        return None
+    return orjson.loads(response.data)["response"][f"{name}-graph"]["figure"]
+
+
+@pytest.mark.parametrize("name", ["pi-top", "rainbow"])
+def test_zoom_reaggregates_the_visible_range(dashboard, synthetic, name):
+    func = dashboard.CHARTS[name]
+    figure = dashboard.build_figure(lambda message: None, name, "BTC", {})
+    shown = [len(trace.x) for trace in figure.data if len(trace.x)]
+    assert max(shown) == resampling.SHOWN_SAMPLES
+
+    # The figure files are all there is: no pickles, nothing in memory
+    assert not resampling._resamplers
+    files = [
+        entry.name for entry in os.scandir(figure_cache.FIGURE_DIR) if entry.is_file()
+    ]
+    assert sorted(name.split(".", 1)[1] for name in files) == ["json.gz", "traces.npz"]
+
+    full = func(symbol="BTC", currency="USD")
+    dates = pd.DatetimeIndex(full.data[0].x)
+    start, end = dates[1000], dates[1200]
+    patch = zoom(
+        dashboard,
+        name,
+        {"xaxis.range[0]": str(start), "xaxis.range[1]": str(end)},
+    )
+    expected = resampling.resample(full).construct_update_data_patch(
+        {"xaxis.range[0]": str(start), "xaxis.range[1]": str(end)}
+    )
+    expected = orjson.loads(to_json_plotly(expected.to_plotly_json()))
+    assert patch["operations"] == expected["operations"]
+    # Every day in the range is back at full resolution
+    sizes = {
+        len(operation["params"]["value"])
+        for operation in patch["operations"]
+        if operation["location"][-1] == "x"
+    }
+    assert sizes == {201}
+
+    # Layout changes that do not move the x axis send nothing
+    assert zoom(dashboard, name, {"autosize": True}) is None
+
+
+def test_figure_is_keyed_on_the_data_it_was_built_from(
+    dashboard, upstream, monkeypatch
+):
+    monkeypatch.setattr(frame_store, "_frames", {})
+    monkeypatch.setattr(resampling, "_resamplers", OrderedDict())
+    # Nothing stored yet, so the job is asked for before the data is fetched
+    assert request_job(dashboard, "rainbow")["version"] is None
+
+    dashboard.build_figure(lambda message: None, "rainbow", "BTC", {})
+
+    version = dashboard.data_version("rainbow", "BTC")
+    assert version is not None
+    func = dashboard.CHARTS["rainbow"]
+    assert dashboard.cached_figure(func, "BTC", version=version) is not None
+    dates = pd.date_range(end=upstream.today, periods=200, freq="D")
+    zoomed = {"xaxis.range[0]": str(dates[0]), "xaxis.range[1]": str(dates[-1])}
+    assert zoom(dashboard, "rainbow", zoomed) is not None
+
+
+@pytest.fixture
+def lanes(dashboard):
+    manager = dashboard.background_callback_manager
+    yield manager
+    for process, jobs in manager._lanes.values():
+        process.terminate()
+        process.join()
+    manager._lanes.clear()
+
+
+def run_job(dashboard, name, job, timeout=30):
+    # Starts the background build of ``job`` and polls it like the browser
+    output = next(
+        key
+        for key, callback in dashboard.app.callback_map.items()
+        if callback["inputs"][0] == {"id": f"{name}-job", "property": "data"}
+    )
+    body = {
+        "output": output,
+        "outputs": {"id": f"{name}-graph", "property": "figure"},
+        "inputs": [{"id": f"{name}-job", "property": "data", "value": job}],
+        "changedPropIds": [f"{name}-job.data"],
+    }
+    client = dashboard.app.server.test_client()
+    started = orjson.loads(client.post("/_dash-update-component", json=body).data)
+    query = f"?cacheKey={started['cacheKey']}&job={started['job']}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        polled = client.post("/_dash-update-component" + query, json=body)
+        if polled.status_code == 200:
+            data = orjson.loads(polled.data)
+            if "response" in data:
+                return data["response"][f"{name}-graph"]["figure"]
+        time.sleep(0.05)
+    raise TimeoutError(name)
+
+
+def test_builds_of_a_symbol_share_a_long_lived_process(
+    dashboard, synthetic, lanes, tmp_path, monkeypatch
+):
+    log = tmp_path / "builds"
+    loaded_data_version = dashboard.loaded_data_version
+
+    def record(*args):
+        with open(log, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        return loaded_data_version(*args)
+
+    monkeypatch.setattr(dashboard, "loaded_data_version", record)
+
+    for name in ("rainbow", "pi-top", "z-score"):
+        assert run_job(dashboard, name, request_job(dashboard, name))["data"]
+
+    pids = set(map(int, log.read_text().split()))
+    (lane,) = [process for process, jobs in lanes._lanes.values()]
+    # One process built them all, and is still there for the next job
+    assert pids == {lane.pid} != {os.getpid()}
+    assert lane.is_alive()
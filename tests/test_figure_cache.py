@@ -0,0 +1,21 @@
+import os
+import time
+
+import figure_cache
+
+
+def test_prune_removes_old_lock_files_nobody_holds(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(figure_cache, "_last_prune", 0.0)
+    old = time.time() - 2 * figure_cache.FIGURE_TIMEOUT
+    with figure_cache.figure_lock("new"):
+        pass
+    with figure_cache.figure_lock("free"):
+        pass
+    with figure_cache.figure_lock("held"):
+        for key in ("free", "held"):
+            os.utime(os.path.join(figure_cache.LOCK_DIR, f"{key}.lock"), (old, old))
+
+        figure_cache.prune_figures()
+
+        assert sorted(os.listdir(figure_cache.LOCK_DIR)) == ["held.lock", "new.lock"]
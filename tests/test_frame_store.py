@@ -0,0 +1,115 @@
+import time
+
+import pandas as pd
+import pytest
+
+from data import frame_store
+from data.frame_store import get_coinmetrics_frame, get_historical_frame
+from data.history_store import write_history
+from data.ingest import coinmetrics_frame, cryptocompare_frame
+
+DAY = pd.Timedelta(days=1)
+
+
+@pytest.fixture(autouse=True)
+def empty_store(monkeypatch):
+    monkeypatch.setattr(frame_store, "_frames", {})
+    monkeypatch.setattr(frame_store, "_key_locks", {})
+
+
+def store_daily_bars(upstream, end):
+    days = pd.date_range(upstream.first_traded, end, freq="D")
+    write_history(
+        "BTC_USD_data",
+        cryptocompare_frame([upstream.bar(int(day.timestamp())) for day in days]),
+    )
+
+
+def test_current_frame_is_shared(upstream):
+    first = get_historical_frame("BTC", "USD")
+    requests = len(upstream.requests)
+
+    again = get_historical_frame("BTC", "USD")
+
+    assert len(upstream.requests) == requests
+    assert again.index[-1] == first.index[-1] == upstream.today
+
+
+def test_stale_frame_is_retried_after_upstream_error(upstream, monkeypatch):
+    monkeypatch.setattr(frame_store, "STALE_RETRY_SECONDS", 0.5)
+    store_daily_bars(upstream, upstream.today - 3 * DAY)
+    upstream.fail = 404
+
+    assert get_historical_frame("BTC", "USD").index[-1] == upstream.today - 3 * DAY
+
+    # Within the retry interval the stale frame is served as is
+    upstream.fail = None
+    assert get_historical_frame("BTC", "USD").index[-1] == upstream.today - 3 * DAY
+
+    time.sleep(0.5)
+    assert get_historical_frame("BTC", "USD").index[-1] == upstream.today
+    assert get_historical_frame("BTC", "USD").index[-1] == upstream.today
+
+
+def test_stale_coinmetrics_frame_is_retried(upstream, monkeypatch):
+    monkeypatch.setattr(frame_store, "STALE_RETRY_SECONDS", 0)
+    yesterday = upstream.today.tz_convert(None) - DAY
+    days = pd.date_range(upstream.metrics_start, yesterday - 5 * DAY)
+    write_history(
+        "BTC_S2F_data", coinmetrics_frame([upstream.metric_row(d) for d in days])
+    )
+    upstream.fail = 404
+    assert get_coinmetrics_frame("BTC").index[-1] == yesterday - 5 * DAY
+
+    upstream.fail = None
+    assert get_coinmetrics_frame("BTC").index[-1] == yesterday
+
+
+def test_frame_loaded_during_a_refresh_is_not_kept(upstream, monkeypatch):
+    store_daily_bars(upstream, upstream.today)
+    stale = frame_store.get_historical_data("BTC", "USD")
+
+    def load_then_refresh(symbol, currency):
+        # Another worker writes newer history while this load is running
+        store_daily_bars(upstream, upstream.today)
+        return stale
+
+    monkeypatch.setattr(frame_store, "get_historical_data", load_then_refresh)
+    get_historical_frame("BTC", "USD")
+
+    loads = []
+    monkeypatch.setattr(
+        frame_store,
+        "get_historical_data",
+        lambda symbol, currency: loads.append(symbol) or stale,
+    )
+    get_historical_frame("BTC", "USD")
+    assert loads == ["BTC"]
+
+
+def test_intraday_frame_is_reloaded_each_source_bar(monkeypatch):
+    monkeypatch.setattr(frame_store, "STALE_RETRY_SECONDS", 0)
+    hour = pd.Timestamp.now(tz="UTC").floor("H")
+    last = {"bar": hour - pd.Timedelta(hours=1)}
+    loads = []
+
+    def load(symbol, currency, timeframe):
+        loads.append(timeframe)
+        return pd.DataFrame({"Close": [1.0]}, index=[last["bar"]])
+
+    monkeypatch.setattr(frame_store, "get_timeframe_data", load)
+
+    # Still missing this hour's bar, so it is not kept for the rest of the day
+    get_historical_frame("BTC", "USD", "1h")
+    get_historical_frame("BTC", "USD", "1h")
+    assert len(loads) == 2
+
+    last["bar"] = hour
+    get_historical_frame("BTC", "USD", "1h")
+    get_historical_frame("BTC", "USD", "1h")
+    assert len(loads) == 3
+
+    # Loaded during the previous hour: the next bar is due
+    frame_store._frames["BTC", "USD", "1h"]["period"] -= pd.Timedelta(hours=1)
+    get_historical_frame("BTC", "USD", "1h")
+    assert len(loads) == 4
@@ -0,0 +1,146 @@
+import pandas as pd
+
+from data.fetch_planner import CRYPTOCOMPARE_PAGE_LIMIT
+from data.get_historical_data import get_coinmetrics_data, get_historical_data
+from data.history_store import write_history
+from data.ingest import coinmetrics_frame, cryptocompare_frame
+
+DAY = pd.Timedelta(days=1)
+
+
+def stored_bars(upstream, start, end):
+    # What the stand-in serves for [start, end], as the store would hold it
+    times = pd.date_range(start, end, freq="D")
+    return cryptocompare_frame([upstream.bar(int(t.timestamp())) for t in times])
+
+
+def histoday_requests(upstream):
+    return [
+        (int(query["toTs"]), int(query["limit"]))
+        for path, query in upstream.requests
+        if path.endswith("/histoday")
+    ]
+
+
+def test_cold_start_pages_back_to_first_traded_bar(upstream):
+    df = get_historical_data("BTC", "USD")
+
+    # 4501 traded bars: two full pages, then one that reaches the zero padding
+    pages = histoday_requests(upstream)
+    assert len(pages) == 3
+    assert all(limit == CRYPTOCOMPARE_PAGE_LIMIT for _, limit in pages)
+    # Each page ends just before the previous page's first bar
+    for (to_ts, _), (next_to_ts, _) in zip(pages, pages[1:]):
+        assert (
+            next_to_ts == to_ts - to_ts % 86400 - CRYPTOCOMPARE_PAGE_LIMIT * 86400 - 1
+        )
+    assert len(df) == 4501
+    assert df.index[0] == upstream.first_traded
+    assert df.index[-1] == upstream.today
+    assert (df["Close"] > 0).all()
+    assert df.index.is_unique and df.index.is_monotonic_increasing
+
+
+def test_cold_start_stops_at_short_page(upstream):
+    # The upstream has no bars at all before ``oldest``
+    upstream.first_traded = upstream.today - pd.Timedelta(days=9000)
+    upstream.oldest = upstream.today - pd.Timedelta(days=3000)
+
+    df = get_historical_data("BTC", "USD")
+
+    assert len(histoday_requests(upstream)) == 2
+    assert len(df) == 3001
+    assert df.index[0] == upstream.oldest
+
+
+def test_gap_pages_request_only_missing_ranges(upstream):
+    # A hole of 50 days in the middle, and the history ends yesterday
+    first = upstream.first_traded
+    write_history(
+        "BTC_USD_data",
+        pd.concat(
+            [
+                stored_bars(upstream, first, first + 99 * DAY),
+                stored_bars(upstream, first + 150 * DAY, upstream.today - DAY),
+            ]
+        ),
+    )
+
+    df = get_historical_data("BTC", "USD")
+
+    hole_end = int((first + 149 * DAY).timestamp())
+    assert histoday_requests(upstream) == [
+        (hole_end, 49),
+        # The last stored bar is fetched again, it may have been saved open
+        (int(upstream.today.timestamp()), 1),
+    ]
+    assert df.index.equals(pd.date_range(first, upstream.today, freq="D", name="Date"))
+    assert df["Close"].tolist() == [100.0 + day for day in range(len(df))]
+
+
+def test_long_gap_is_split_into_limit_pages(upstream):
+    first = upstream.first_traded
+    write_history("BTC_USD_data", stored_bars(upstream, first, first + 9 * DAY))
+
+    df = get_historical_data("BTC", "USD")
+
+    # Bars from the last stored one to today, newest page first
+    missing = len(pd.date_range(first + 9 * DAY, upstream.today, freq="D"))
+    pages = histoday_requests(upstream)
+    assert [limit for _, limit in pages] == [
+        CRYPTOCOMPARE_PAGE_LIMIT,
+        CRYPTOCOMPARE_PAGE_LIMIT,
+        missing - 2 * (CRYPTOCOMPARE_PAGE_LIMIT + 1) - 1,
+    ]
+    assert pages[0][0] == int(upstream.today.timestamp())
+    assert len(df) == 4501 and df.index.is_unique
+
+
+def test_stored_history_is_served_on_upstream_error(upstream):
+    stored = stored_bars(upstream, upstream.first_traded, upstream.today - 5 * DAY)
+    write_history("BTC_USD_data", stored)
+    upstream.fail = 404
+
+    df = get_historical_data("BTC", "USD")
+
+    assert len(histoday_requests(upstream)) == 1
+    assert df.index.equals(stored.index)
+
+
+def test_coinmetrics_follows_next_page_token(upstream, monkeypatch):
+    monkeypatch.setattr("data.get_historical_data.COINMETRICS_PAGE_SIZE", 100)
+
+    df = get_coinmetrics_data("BTC")
+
+    yesterday = upstream.today.tz_convert(None) - DAY
+    days = pd.date_range(upstream.metrics_start, yesterday, freq="D")
+    tokens = [query.get("next_page_token") for _, query in upstream.requests]
+    assert len(tokens) == -(-len(days) // 100)
+    assert tokens == [None] + [str(100 * page) for page in range(1, len(tokens))]
+    assert df.index.equals(pd.DatetimeIndex(days, name="time"))
+    assert df["tsupply"].iloc[-1] == 1e7 + 900 * (len(days) - 1)
+
+
+def test_coinmetrics_gap_fetch_and_stale_fallback(upstream):
+    yesterday = upstream.today.tz_convert(None) - DAY
+    stored = coinmetrics_frame(
+        [
+            upstream.metric_row(day)
+            for day in pd.date_range(upstream.metrics_start, yesterday - 10 * DAY)
+        ]
+    )
+    write_history("BTC_S2F_data", stored)
+
+    # Stale and the upstream fails: the stored rows are served
+    upstream.fail = 404
+    assert get_coinmetrics_data("BTC").index.equals(stored.index)
+
+    # Once it answers, only the missing days are asked for
+    upstream.fail = None
+    upstream.requests.clear()
+    df = get_coinmetrics_data("BTC")
+    assert len(upstream.requests) == 1
+    query = upstream.requests[0][1]
+    assert query["start_time"] == (yesterday - 10 * DAY).strftime("%Y-%m-%d")
+    assert query["end_time"] == yesterday.strftime("%Y-%m-%d")
+    assert df.index[-1] == yesterday and df.index.is_unique
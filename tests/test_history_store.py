@@ -0,0 +1,67 @@
+import os
+
+import pandas as pd
+import pytest
+
+from data import history_store
+from data.history_store import (
+    history_exists,
+    history_path,
+    migrate_legacy_file,
+    read_history,
+    write_history,
+)
+from data.locking import file_lock
+
+
+@pytest.fixture(autouse=True)
+def in_tmp(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+
+
+def history(start="2019-01-01", end="2023-12-31"):
+    index = pd.date_range(start, end, freq="D", tz="UTC", name="Date")
+    return pd.DataFrame({"Close": range(len(index))}, index=index, dtype=float)
+
+
+def test_partitions_appear_together(monkeypatch):
+    seen = []
+    to_parquet = pd.DataFrame.to_parquet
+
+    def write_and_look(self, path, *args, **kwargs):
+        seen.append(history_exists("BTC_USD_data"))
+        return to_parquet(self, path, *args, **kwargs)
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", write_and_look)
+    write_history("BTC_USD_data", history())
+
+    assert seen == [False] * 5
+    assert sorted(os.listdir(history_path("BTC_USD_data"))) == [
+        f"{year}.parquet" for year in range(2019, 2024)
+    ]
+    # Nothing is left behind next to the dataset
+    assert os.listdir(history_store.HISTORY_DIR) == ["BTC_USD_data"]
+
+
+def test_rewrite_replaces_the_whole_dataset():
+    write_history("BTC_USD_data", history())
+    write_history("BTC_USD_data", history("2022-06-01", "2023-12-31"))
+
+    assert read_history("BTC_USD_data").index[0] == pd.Timestamp("2022-06-01", tz="UTC")
+    assert os.listdir(history_store.HISTORY_DIR) == ["BTC_USD_data"]
+
+
+def test_migration_holds_the_dataset_lock():
+    history().to_parquet("BTC_USD_data.parquet")
+    locked = []
+
+    def read(filename):
+        with file_lock(history_path("BTC_USD_data"), blocking=False) as acquired:
+            locked.append(not acquired)
+        return pd.read_parquet(filename)
+
+    assert migrate_legacy_file("BTC_USD_data", "BTC_USD_data.parquet", read=read)
+    assert locked == [True]
+    assert len(read_history("BTC_USD_data")) == len(history())
+    # Only once
+    assert not migrate_legacy_file("BTC_USD_data", "BTC_USD_data.parquet", read=read)
@@ -0,0 +1,109 @@
+import time
+
+import pandas as pd
+import pytest
+import requests
+
+from data import http_client
+from data.get_historical_data import get_historical_data
+from data.history_store import write_history
+from data.http_client import (
+    UpstreamConnectionError,
+    UpstreamError,
+    UpstreamTimeout,
+    fetch_deadline,
+    get_json,
+)
+from data.ingest import cryptocompare_frame
+
+RETRIED = http_client.MAX_ATTEMPTS
+
+
+@pytest.fixture
+def failing_session(monkeypatch):
+    """Make every request raise the exception put in ``errors``."""
+    errors = []
+    calls = []
+
+    def get(self, url, **kwargs):
+        calls.append(url)
+        raise errors[0]
+
+    monkeypatch.setattr(requests.Session, "get", get)
+    # Retry without waiting
+    monkeypatch.setattr(http_client._get.retry, "sleep", lambda seconds: None)
+    return errors, calls
+
+
+@pytest.mark.parametrize(
+    "error, expected, attempts",
+    [
+        (requests.ConnectTimeout("slow"), UpstreamTimeout, RETRIED),
+        (requests.ConnectionError("refused"), UpstreamConnectionError, RETRIED),
+        (
+            requests.exceptions.ChunkedEncodingError("cut"),
+            UpstreamConnectionError,
+            RETRIED,
+        ),
+        (requests.TooManyRedirects("loop"), UpstreamError, 1),
+        (requests.exceptions.InvalidURL("bad"), UpstreamError, 1),
+    ],
+)
+def test_request_errors_become_upstream_errors(
+    failing_session, error, expected, attempts
+):
+    errors, calls = failing_session
+    errors.append(error)
+
+    with pytest.raises(expected) as raised:
+        get_json("test", "http://upstream.invalid/data")
+
+    assert type(raised.value) is expected
+    assert len(calls) == attempts
+
+
+def test_stored_history_is_served_on_dropped_body(upstream, failing_session):
+    days = pd.date_range(upstream.first_traded, upstream.today - pd.Timedelta(days=3))
+    stored = cryptocompare_frame([upstream.bar(int(t.timestamp())) for t in days])
+    write_history("BTC_USD_data", stored)
+    errors, _ = failing_session
+    errors.append(requests.exceptions.ChunkedEncodingError("cut"))
+
+    assert get_historical_data("BTC", "USD").index.equals(stored.index)
+
+
+@pytest.fixture
+def stalled_session(monkeypatch):
+    """Requests that wait out their read timeout; yields the timeouts asked for."""
+    timeouts = []
+
+    def get(self, url, timeout=None, **kwargs):
+        timeouts.append(timeout)
+        time.sleep(timeout[1])
+        raise requests.ReadTimeout("stalled")
+
+    monkeypatch.setattr(requests.Session, "get", get)
+    return timeouts
+
+
+def test_retries_stop_at_the_deadline(stalled_session):
+    started = time.monotonic()
+    with pytest.raises(UpstreamTimeout):
+        with fetch_deadline(1.5):
+            get_json("test", "http://upstream.invalid/data")
+
+    assert time.monotonic() - started < 1.8
+    # One attempt, its read timeout cut to what was left
+    ((connect, read),) = stalled_session
+    assert read <= 1.5
+
+
+def test_requests_of_one_fetch_share_the_deadline(stalled_session):
+    with fetch_deadline(1.5):
+        with pytest.raises(UpstreamTimeout):
+            get_json("test", "http://upstream.invalid/page-1")
+        with pytest.raises(UpstreamTimeout):
+            get_json("test", "http://upstream.invalid/page-2")
+
+    # The second page was not even tried
+    assert len(stalled_session) == 1
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import regression, rolling, seasonality, stock_to_flow
+
+DAYS = 1200
+
+
+@pytest.fixture(autouse=True)
+def empty_states():
+    for module in (rolling, seasonality, regression, stock_to_flow):
+        module.reset()
+
+
+def daily(values):
+    index = pd.date_range("2019-03-01", periods=len(values), freq="D", tz="UTC")
+    return pd.Series(values, index=index)
+
+
+def revisions(values):
+    """The histories a render sees over time, with how each differs.
+
+    The first ``DAYS - 10`` values, three new days appended, the last day
+    re-fetched with a new value, and an earlier day restated.
+    """
+    appended = values[: DAYS - 7].copy()
+    refetched = appended.copy()
+    refetched[-1] *= 1.01
+    restated = refetched.copy()
+    restated[DAYS // 2] *= 0.99
+    return [
+        (values[: DAYS - 10], None),
+        (appended, "kept"),
+        (refetched, "kept"),
+        (restated, "rebuilt"),
+    ]
+
+
+def states(module):
+    return dict(module._states._states)
+
+
+def assert_path(before, after, path):
+    (key,) = after
+    if path == "kept":
+        assert after[key] is before[key]
+    elif path == "rebuilt":
+        assert after[key] is not before[key]
+
+
+@pytest.fixture
+def values():
+    return 1.0 + np.random.default_rng(0).random(DAYS)
+
+
+def test_rolling_stats_match_a_full_recompute(values):
+    for history, path in revisions(values):
+        before = states(rolling)
+        series = daily(history)
+
+        mean, std = rolling.rolling_stats("BTC", "close", series, 20)
+
+        assert_path(before, states(rolling), path)
+        np.testing.assert_allclose(mean, series.rolling(20).mean(), rtol=1e-9)
+        np.testing.assert_allclose(std, series.rolling(20).std(), rtol=1e-9)
+
+
+def test_seasonal_matrix_matches_a_full_recompute(values):
+    for history, path in revisions(values):
+        before = states(seasonality)
+        returns = daily(np.log(history))
+
+        years, matrix = seasonality.cumulative_return_matrix("BTC", returns)
+
+        assert_path(before, states(seasonality), path)
+        full = seasonality._SeasonalMatrix(returns.index, returns.to_numpy())
+        full_years, full_matrix = full.result()
+        np.testing.assert_array_equal(years, full_years)
+        np.testing.assert_allclose(matrix, full_matrix, rtol=1e-12)
+
+
+def test_linear_fit_matches_polyfit(values):
+    for history, path in revisions(values):
+        before = states(regression)
+        x = np.log(np.arange(1, len(history) + 1, dtype=np.float64))
+        y = np.log(history)
+
+        slope, intercept = regression.linear_fit(("BTC",), x, y)
+
+        assert_path(before, states(regression), path)
+        np.testing.assert_allclose((slope, intercept), np.polyfit(x, y, 1), rtol=1e-9)
+
+
+def test_weekly_model_price_matches_resample(values):
+    supply = np.cumsum(values) * 1000
+    for history, path in revisions(supply):
+        before = states(stock_to_flow)
+        index = daily(history).index
+        issuance = np.full(len(history), 900.0)
+
+        dates, price = stock_to_flow.weekly_model_price("BTC", index, history, issuance)
+
+        assert_path(before, states(stock_to_flow), path)
+        s2f = pd.Series(stock_to_flow.daily_s2f(history, issuance), index=index)
+        expected = stock_to_flow.model_price(s2f.resample("W").mean())
+        assert dates.equals(expected.index)
+        np.testing.assert_allclose(price, expected, rtol=1e-12)
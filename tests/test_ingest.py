@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from data.ingest import coinmetrics_frame
+
+
+def test_coinmetrics_columns_cover_every_row():
+    # Early days carry no market data, so CoinMetrics leaves those keys out
+    rows = [
+        {"asset": "btc", "time": "2010-07-17T00:00:00.000000000Z", "SplyCur": "1"},
+        {
+            "asset": "btc",
+            "time": "2010-07-18T00:00:00.000000000Z",
+            "SplyCur": "2",
+            "PriceUSD": "0.08",
+            "CapMrktCurUSD": "0.16",
+        },
+    ]
+
+    df = coinmetrics_frame(rows)
+
+    normalized = pd.json_normalize(rows).drop(columns="time")
+    assert set(df.columns) == set(
+        normalized.rename(columns={"SplyCur": "tsupply"}).columns
+    )
+    assert df["tsupply"].tolist() == [1.0, 2.0]
+    assert np.isnan(df["CapMrktCurUSD"].iloc[0])
+    assert df["CapMrktCurUSD"].iloc[1] == 0.16
+    prices = pd.to_numeric(df["PriceUSD"], errors="coerce")
+    assert np.isnan(prices.iloc[0]) and prices.iloc[1] == 0.08
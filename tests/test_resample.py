@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from data.get_historical_data import get_timeframe_data
+from data.providers import SyntheticProvider
+from data.resample import (
+    OHLCV_AGG,
+    resample_ohlcv,
+    source_timeframe,
+    timeframe_delta,
+)
+
+
+@pytest.fixture
+def hourly():
+    # 400 days of hourly bars, starting at an hour no rule bins from
+    index = pd.date_range("2023-01-01 03:00", periods=24 * 400, freq="H", tz="UTC")
+    close = np.random.default_rng(0).random(len(index)) + 1.0
+    return pd.DataFrame(
+        {
+            "Open": close,
+            "High": close + 1.0,
+            "Low": close - 1.0,
+            "Close": close,
+            "Volume": close,
+        },
+        index=index,
+    )
+
+
+@pytest.mark.parametrize(
+    "timeframe, delta",
+    [
+        ("15m", pd.Timedelta(minutes=15)),
+        ("4h", pd.Timedelta(hours=4)),
+        ("3d", pd.Timedelta(days=3)),
+        ("1w", pd.Timedelta(days=7)),
+        ("2w", pd.Timedelta(days=14)),
+    ],
+)
+def test_timeframe_delta(timeframe, delta):
+    assert timeframe_delta(timeframe) == delta
+
+
+def test_source_timeframe():
+    assert source_timeframe("1w") == "1d"
+    assert source_timeframe("2w") == "1d"
+    assert source_timeframe("3d") == "1d"
+    assert source_timeframe("5h") == "1h"
+    assert source_timeframe("15m") == "1m"
+
+
+@pytest.mark.parametrize("timeframe", ["5h", "7h", "4h", "3d", "7d", "1w", "2w"])
+def test_chunks_resample_like_the_whole_frame(hourly, timeframe):
+    # Monthly partitions, as intraday histories are stored
+    chunks = [chunk for _, chunk in hourly.groupby(hourly.index.strftime("%Y-%m"))]
+
+    assert_frame_equal(
+        resample_ohlcv(chunks, timeframe),
+        resample_ohlcv([hourly], timeframe),
+        check_freq=False,
+    )
+
+
+def test_bins_do_not_depend_on_where_the_data_starts(hourly):
+    whole = resample_ohlcv([hourly], "5h")
+    later = resample_ohlcv([hourly.iloc[7:]], "5h")
+
+    assert set(later.index) <= set(whole.index)
+
+
+def test_weeks_match_pandas_weekly_bars(hourly):
+    daily = hourly.resample("D").agg(OHLCV_AGG)
+    expected = daily.resample("W").agg(OHLCV_AGG).dropna(subset=["Close"])
+
+    assert_frame_equal(resample_ohlcv([daily], "1w"), expected, check_freq=False)
+    # Two-week bars cover the same days as pairs of weekly bars
+    two_weeks = resample_ohlcv([daily], "2w")
+    assert (two_weeks.index.dayofweek == 6).all()
+    assert two_weeks["Volume"].sum() == pytest.approx(daily["Volume"].sum())
+
+
+@pytest.mark.parametrize("timeframe", ["1w", "2w"])
+def test_weekly_timeframe_data(upstream, timeframe):
+    df = get_timeframe_data("BTC", "USD", timeframe)
+
+    assert (df.index.dayofweek == 6).all()
+    assert (df.index.to_series().diff().dropna() == timeframe_delta(timeframe)).all()
+    assert (
+        df["Close"].iloc[-1] == upstream.bar(int(upstream.today.timestamp()))["close"]
+    )
+
+
+@pytest.mark.parametrize("timeframe", ["1w", "2w"])
+def test_synthetic_weekly_bars(timeframe):
+    df = SyntheticProvider(length=100).get_historical_data("BTC", "USD", timeframe)
+
+    assert len(df) == 100
+    assert (df.index.dayofweek == 6).all()
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import scanner
+from data.providers import SyntheticProvider
+from rainbow_chart import get_rainbow_plot
+
+
+@pytest.fixture
+def provider():
+    # Reaches back before 2012, where the BTC chart starts its fit
+    return SyntheticProvider(length=6000, seed=3)
+
+
+@pytest.mark.parametrize("symbol", ["BTC", "ETH"])
+def test_rainbow_events_use_the_chart_bands(provider, symbol, monkeypatch):
+    bands = []
+    rainbow_band = scanner.rainbow_band
+
+    def record(close, scanned):
+        bands.append(scanned)
+        return rainbow_band(close, scanned)
+
+    monkeypatch.setattr(scanner, "rainbow_band", record)
+
+    scanner.scan_symbol(symbol, provider=provider, since="2000-01-01")
+    figure = get_rainbow_plot(symbol, "USD", provider)
+
+    (scanned,) = bands
+    # Up to the last closed bar
+    drawn = np.array([trace.y for trace in figure.data[:-1]])
+    np.testing.assert_allclose(scanned, drawn[:, :-1])
+
+
+def test_open_bar_is_not_scanned(provider, monkeypatch):
+    monkeypatch.setattr(
+        scanner.kernels, "crosses_above", lambda values, level: np.ones(len(values))
+    )
+    today = pd.Timestamp.now(tz="UTC").floor("D")
+    yesterday = (today - pd.Timedelta(days=1)).date().isoformat()
+    assert provider.get_historical_data("BTC", "USD").index[-1] == today
+
+    events, last = scanner.scan_symbol("BTC", provider=provider)
+    assert last == yesterday
+    assert {event["date"] for event in events} == {yesterday}
+
+    # Nothing has closed since
+    assert scanner.scan_symbol("BTC", provider=provider, since=last) == ([], last)
+
+
+def test_failed_state_write_leaves_no_temp_file(tmp_path, monkeypatch):
+    path = tmp_path / "state.json"
+    scanner.save_state({"BTC": "2024-01-01"}, path)
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(scanner.os, "replace", fail)
+    with pytest.raises(OSError):
+        scanner.save_state({"BTC": "2024-01-02"}, path)
+
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
+    assert scanner.load_state(path) == {"BTC": "2024-01-01"}
@@ -1,15 +1,15 @@
 import plotly.graph_objects as go
 
-from data.get_historical_data import get_historical_data
+from data.providers import get_provider
+from indicators.compute import z_score
+from indicators.features import get_features
 
 
-def get_z_score_plot(symbol, currency):
-    data = get_historical_data(symbol, currency)
+def get_z_score_plot(symbol, currency, provider=None, timeframe="1d"):
+    data = get_provider(provider).get_historical_data(symbol, currency, timeframe)
 
     # Calculate Z-score as a rolling 43-day average
-    data["Z-Score"] = (data["Close"] - data["Close"].rolling(window=511).mean()) / data[
-        "Close"
-    ].rolling(window=511).std()
+    z = z_score(get_features(symbol, currency, data, timeframe), 511)
 
     # Plotting
     fig = go.Figure()
@@ -29,7 +29,7 @@ def get_z_score_plot(symbol, currency):
     fig.add_trace(
         go.Scatter(
             x=data.index,
-            y=data["Z-Score"],
+            y=z,
             mode="lines",
             name="Z-Score",
             line=dict(color="deeppink"),
@@ -67,7 +67,7 @@ def get_z_score_plot(symbol, currency):
 
     # Update layout
     fig.update_layout(
-        title="Z-Score Analysis for " + symbol + "$ 1D",
+        title="Z-Score Analysis for " + symbol + "$ " + timeframe.upper(),
         title_x=0.5,
         xaxis=dict(title="Date"),
         yaxis=dict(